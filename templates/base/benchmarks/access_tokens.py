@@ -0,0 +1,74 @@
+"""Access token verification benchmark.
+
+Times `TokenManager.verify_access_token` for the same token with every JWT
+codec, without and with the verified access tokens cache. The PyJWT codec is
+skipped when PyJWT is not installed. Nothing is sent to the database or to
+Redis, the benchmark only needs the settings from `server/.env`. Run it from
+the project root:
+
+    python -m benchmarks.access_tokens [iterations]
+"""
+
+import sys
+from time import perf_counter
+from unittest.mock import AsyncMock
+
+from server.config import settings as s
+from server.db.cache import LocalCache
+from server.utils.security.jwt_codecs import JWT_CODECS
+from server.utils.security.jwt_codecs import JWTCodec
+from server.utils.security.tokens import TokenManager
+
+ITERATIONS = 100_000
+
+
+def _token_manager(codec: JWTCodec, cached: bool) -> TokenManager:
+    verified_access_tokens = (
+        LocalCache(max_size=s.ACCESS_TOKEN_CACHE_SIZE, ttl=60) if cached else None
+    )
+    return TokenManager(
+        AsyncMock(),
+        AsyncMock(),
+        AsyncMock(),
+        AsyncMock(),
+        AsyncMock(),
+        codec=codec,
+        verified_access_tokens=verified_access_tokens,
+    )
+
+
+def _measure(token_manager: TokenManager, token: str, iterations: int) -> float:
+    token_manager.verify_access_token(token)
+
+    started_at = perf_counter()
+    for _ in range(iterations):
+        token_manager.verify_access_token(token)
+    return (perf_counter() - started_at) / iterations * 1_000_000
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else ITERATIONS
+
+    print(f"{iterations} verifications per codec")
+    print(f"{'codec':<10}{'uncached us':>14}{'cached us':>12}")
+
+    for name, codec_class in JWT_CODECS.items():
+        try:
+            codec = codec_class(s.AUTH_SECRET, s.ALGORITHM)
+        except ImportError:
+            print(f"{name:<10}{'not installed':>26}")
+            continue
+
+        token = _token_manager(codec, cached=False).create_access_token(
+            data={"sub": "benchmark", "role": "user"}
+        )
+
+        uncached = _measure(
+            _token_manager(codec, cached=False), token.token, iterations
+        )
+        cached = _measure(_token_manager(codec, cached=True), token.token, iterations)
+        print(f"{name:<10}{uncached:>14.2f}{cached:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
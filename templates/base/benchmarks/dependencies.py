@@ -0,0 +1,126 @@
+"""Dependency resolution micro-benchmark.
+
+Resolves the dependency graph of every route with the database session, the
+caches, the current user and their profile stubbed out, once with the collaborators built per
+request (the previous behaviour) and once with the app-scoped singletons.
+
+Run it from the project root:
+
+    python -m benchmarks.dependencies
+"""
+
+import asyncio
+import tracemalloc
+from contextlib import AsyncExitStack
+from time import perf_counter
+
+from argon2 import PasswordHasher
+from fastapi import FastAPI
+from fastapi.dependencies.utils import solve_dependencies
+from fastapi.routing import APIRoute
+from server import create_app
+from server.db import get_cache
+from server.db import get_raw_cache
+from server.db import get_session
+from server.db.user.cache import CachedUser
+from server.db.user.schema import UserRole
+from server.services.auth.dependencies import _get_current_user
+from server.services.auth.dependencies import get_current_user_profile
+from server.services.email import EmailService
+from server.services.email import get_email_service
+from server.utils.security import get_password_manager
+from server.utils.security.principal import Principal
+from starlette.requests import Request
+
+ITERATIONS = 2000
+
+
+async def _stub_session():
+    yield object()
+
+
+def _request(app: FastAPI, route: APIRoute) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "app": app,
+            "method": next(iter(route.methods)),
+            "path": route.path,
+            "path_params": {},
+            "query_string": b"",
+            "headers": [(b"authorization", b"Bearer benchmark")],
+        }
+    )
+
+
+async def _resolve(app: FastAPI, route: APIRoute) -> None:
+    async with AsyncExitStack() as stack:
+        await solve_dependencies(
+            request=_request(app, route),
+            dependant=route.dependant,
+            body=None,
+            dependency_overrides_provider=app,
+            async_exit_stack=stack,
+            embed_body_fields=False,
+        )
+
+
+async def _measure(app: FastAPI, route: APIRoute) -> tuple[float, float]:
+    await _resolve(app, route)
+
+    started_at = perf_counter()
+    for _ in range(ITERATIONS):
+        await _resolve(app, route)
+    latency = (perf_counter() - started_at) / ITERATIONS * 1_000_000
+
+    tracemalloc.start()
+    await _resolve(app, route)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return latency, peak / 1024
+
+
+async def main():
+    app = create_app()
+    app.dependency_overrides[get_session] = _stub_session
+    app.dependency_overrides[get_cache] = lambda: object()
+    app.dependency_overrides[get_raw_cache] = lambda: object()
+    app.dependency_overrides[_get_current_user] = lambda: Principal(
+        id="benchmark", role=UserRole.USER, verified=True
+    )
+    app.dependency_overrides[get_current_user_profile] = lambda: CachedUser(
+        id="benchmark",
+        first_name="Benchmark",
+        last_name="Dependencies",
+        email="benchmark.dependencies@example.com",
+        role=UserRole.USER,
+    )
+
+    per_request = {
+        get_email_service: lambda: EmailService(),
+        get_password_manager: lambda: PasswordHasher(),
+    }
+
+    print(f"{'route':<45}{'per-request':>22}{'app-scoped':>22}")
+    print(f"{'':<45}{'us':>11}{'KiB':>11}{'us':>11}{'KiB':>11}")
+
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+
+        app.dependency_overrides.update(per_request)
+        before = await _measure(app, route)
+
+        for dependency in per_request:
+            app.dependency_overrides.pop(dependency)
+        after = await _measure(app, route)
+
+        name = f"{next(iter(route.methods))} {route.path}"
+        print(
+            f"{name:<45}{before[0]:>11.1f}{before[1]:>11.1f}{after[0]:>11.1f}{after[1]:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
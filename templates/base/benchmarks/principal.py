@@ -0,0 +1,93 @@
+"""Authenticated request principal benchmark.
+
+Compares what resolving the current user of a request costs when it is a
+full `User` entity, validated back from the JSON Redis entry as the
+authentication used to do, with the `Principal` built from the binary
+cached user. For both, it reports the CPU time and the memory allocated per
+Redis hit, and the memory an in-process cache entry keeps alive. Nothing is
+sent to Redis, the benchmark only needs the settings from `server/.env`. Run
+it from the project root:
+
+    python -m benchmarks.principal [iterations]
+"""
+
+import sys
+import tracemalloc
+from time import perf_counter
+from typing import Callable
+
+import orjson as json
+from server.db.user.cache import CachedUser
+from server.db.user.cache import decode_user
+from server.db.user.cache import encode_user
+from server.db.user.schema import User
+from server.db.user.schema import UserRole
+from server.utils import cuid
+from server.utils import nowutc
+from server.utils.security.principal import Principal
+
+ITERATIONS = 100_000
+RETAINED = 10_000
+
+
+def _measure_time(resolve: Callable[[], object], iterations: int) -> float:
+    resolve()
+
+    started_at = perf_counter()
+    for _ in range(iterations):
+        resolve()
+    return (perf_counter() - started_at) / iterations * 1_000_000
+
+
+def _measure_allocated(resolve: Callable[[], object]) -> float:
+    tracemalloc.start()
+    resolve()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def _measure_retained(resolve: Callable[[], object]) -> float:
+    tracemalloc.start()
+    entries = [resolve() for _ in range(RETAINED)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del entries
+    return current / RETAINED
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else ITERATIONS
+
+    user = User(
+        id=cuid(),
+        first_name="Benchmark",
+        last_name="Principal",
+        email="benchmark.principal@example.com",
+        password="$argon2id$v=19$m=65536,t=3,p=4$" + "x" * 66,
+        role=UserRole.USER,
+        verified=nowutc(),
+        created_at=nowutc(),
+        updated_at=nowutc(),
+    )
+    json_entry = json.dumps(user.model_dump()).decode("utf-8")
+    binary_entry = encode_user(CachedUser.from_row(user.model_dump()))
+
+    resolvers = {
+        "User entity": lambda: User.model_validate(json.loads(json_entry)),
+        "Principal": lambda: Principal.from_user(decode_user(binary_entry)),
+    }
+
+    print(f"{iterations} resolutions per path")
+    print(f"{'current user':<16}{'us':>10}{'alloc B':>12}{'L1 entry B':>12}")
+
+    for name, resolve in resolvers.items():
+        print(
+            f"{name:<16}{_measure_time(resolve, iterations):>10.2f}"
+            f"{_measure_allocated(resolve):>12.0f}{_measure_retained(resolve):>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""ORM entity vs Core projection benchmark.
+
+Times the database reads of the login and of the `_get_current_user` cache
+miss, once through the ORM entity queries and once through the Core column
+projections. Every read runs in its own session, the way a request does.
+
+It needs the database from `server/.env` to be reachable. Run it from the
+project root:
+
+    python -m benchmarks.projections [iterations]
+"""
+
+import asyncio
+import sys
+import tracemalloc
+from time import perf_counter
+from typing import Awaitable
+from typing import Callable
+
+from server.db import create_db
+from server.db import db_engine
+from server.db.session import LazySession
+from server.db.user.dao import UserDAO
+from server.db.user.schema import User
+from server.utils import cuid
+from server.utils import nowutc
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+ITERATIONS = 2000
+
+Read = Callable[[UserDAO], Awaitable[object]]
+
+
+async def _create_user() -> User:
+    user = User(
+        first_name="Benchmark",
+        last_name="Projection",
+        email=f"{cuid()}@benchmark.local",
+        password="benchmark",
+        verified=nowutc(),
+    )
+
+    async with AsyncSession(db_engine, expire_on_commit=False) as session:
+        session.add(user)
+        await session.commit()
+
+    return user
+
+
+async def _delete_user(user_id: str) -> None:
+    async with AsyncSession(db_engine) as session:
+        await session.delete(await session.get(User, user_id))
+        await session.commit()
+
+
+async def _read(read: Read) -> None:
+    session = LazySession(db_engine)
+    try:
+        await read(UserDAO(session, None))
+    finally:
+        await session.release()
+
+
+async def _measure(read: Read, iterations: int) -> tuple[float, float]:
+    await _read(read)
+
+    started_at = perf_counter()
+    for _ in range(iterations):
+        await _read(read)
+    latency = (perf_counter() - started_at) / iterations * 1_000_000
+
+    tracemalloc.start()
+    await _read(read)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return latency, peak / 1024
+
+
+async def _current_user_from_orm(dao: UserDAO, user_id: str) -> dict:
+    user = await dao.get_user_by_id(user_id)
+    return user.model_dump()
+
+
+async def _current_user_from_core(dao: UserDAO, user_id: str) -> dict:
+    row = await dao.get_user_row_by_id(user_id)
+    return User(**row._mapping).model_dump()
+
+
+async def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else ITERATIONS
+
+    # NOTE: Statement echo would dominate the measurement.
+    db_engine.echo = False
+
+    await create_db()
+    user = await _create_user()
+
+    flows = {
+        "login": (
+            lambda dao: dao.get_user_by_email(user.email),
+            lambda dao: dao.get_login_credentials(user.email),
+        ),
+        "current user": (
+            lambda dao: _current_user_from_orm(dao, user.id),
+            lambda dao: _current_user_from_core(dao, user.id),
+        ),
+    }
+
+    print(f"{iterations} reads per path")
+    print(f"{'flow':<16}{'orm':>22}{'core':>22}")
+    print(f"{'':<16}{'us':>11}{'KiB':>11}{'us':>11}{'KiB':>11}")
+
+    try:
+        for name, (orm_read, core_read) in flows.items():
+            orm = await _measure(orm_read, iterations)
+            core = await _measure(core_read, iterations)
+            print(
+                f"{name:<16}{orm[0]:>11.1f}{orm[1]:>11.1f}{core[0]:>11.1f}{core[1]:>11.1f}"
+            )
+    finally:
+        await _delete_user(user.id)
+        await db_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
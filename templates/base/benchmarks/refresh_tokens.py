@@ -0,0 +1,191 @@
+"""Refresh token store benchmark.
+
+Rotates refresh tokens against the configured PostgreSQL database and Redis
+instance, once with the SQL store and once with the Redis store. Every worker
+owns its own token chain and every rotation runs in its own unit of work, the
+way a refresh request does.
+
+It needs the database and the cache from `server/.env` to be reachable. Run it
+from the project root:
+
+    python -m benchmarks.refresh_tokens [workers] [rotations]
+"""
+
+import asyncio
+import statistics
+import sys
+from time import perf_counter
+from typing import Callable
+from typing import List
+
+from redis import asyncio as aioredis
+from server import db
+from server.config import settings as s
+from server.db import create_db
+from server.db import db_engine
+from server.db import get_session
+from server.db.auth.dao import AuthDAO
+from server.db.auth.schema import Device
+from server.db.auth.stores import RedisRefreshTokenStore
+from server.db.auth.stores import RefreshTokenStore
+from server.db.auth.stores import SQLRefreshTokenStore
+from server.db.auth.stores import SQLValidationTokenStore
+from server.db.user.dao import UserDAO
+from server.db.user.schema import User
+from server.utils import cuid
+from server.utils.security.tokens import TokenManager
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+WORKERS = 50
+ROTATIONS = 200
+
+StoreFactory = Callable[[AsyncSession, aioredis.Redis], RefreshTokenStore]
+
+
+async def _create_owner() -> tuple[str, str]:
+    user = User(
+        first_name="Benchmark",
+        last_name="Refresh",
+        email=f"{cuid()}@benchmark.local",
+        password="benchmark",
+    )
+    device = Device(
+        user_id=user.id,
+        browser="benchmark",
+        browser_version="1",
+        os="benchmark",
+        device_type="benchmark",
+        is_mobile=False,
+        is_tablet=False,
+        is_desktop=True,
+        raw_user_agent="benchmark",
+        ip_address="127.0.0.1",
+    )
+
+    async with AsyncSession(db_engine) as session:
+        session.add(user)
+        await session.flush()
+        session.add(device)
+        await session.commit()
+        return user.id, device.id
+
+
+async def _delete_owner(user_id: str) -> None:
+    async with AsyncSession(db_engine) as session:
+        user = await session.get(User, user_id)
+        await session.delete(user)
+        await session.commit()
+
+
+async def _in_unit_of_work(factory: StoreFactory, work):
+    sessions = get_session()
+    session = await anext(sessions)
+    token_manager = TokenManager(
+        AuthDAO(session),
+        UserDAO(session, db.cache),
+        db.cache,
+        factory(session, db.cache),
+        SQLValidationTokenStore(AuthDAO(session)),
+    )
+
+    try:
+        result = await work(token_manager)
+    except Exception as e:
+        # NOTE: Rolls the unit of work back and re-raises.
+        await sessions.athrow(e)
+
+    await anext(sessions, None)
+    return result
+
+
+async def _worker(
+    factory: StoreFactory,
+    user_id: str,
+    device_id: str,
+    rotations: int,
+    latencies: List[float],
+) -> None:
+    refresh_token = await _in_unit_of_work(
+        factory,
+        lambda tm: tm.create_refresh_token({"sub": user_id, "device_id": device_id}),
+    )
+    token = refresh_token.token
+
+    for _ in range(rotations):
+        started_at = perf_counter()
+        refresh_token, _ = await _in_unit_of_work(
+            factory, lambda tm, token=token: tm.rotate_refresh_token(token)
+        )
+        latencies.append((perf_counter() - started_at) * 1000)
+        token = refresh_token.token
+
+    await _in_unit_of_work(
+        factory,
+        lambda tm: tm.invalidate_refresh_token(tm.get_refresh_token_jti(token)),
+    )
+
+
+async def _run(
+    name: str,
+    factory: StoreFactory,
+    user_id: str,
+    device_id: str,
+    workers: int,
+    rotations: int,
+) -> None:
+    latencies: List[float] = []
+
+    started_at = perf_counter()
+    await asyncio.gather(
+        *(
+            _worker(factory, user_id, device_id, rotations, latencies)
+            for _ in range(workers)
+        )
+    )
+    elapsed = perf_counter() - started_at
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:<8}{len(latencies) / elapsed:>12.0f}{quantiles[49]:>10.2f}{quantiles[94]:>10.2f}{quantiles[98]:>10.2f}"
+    )
+
+
+async def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else WORKERS
+    rotations = int(sys.argv[2]) if len(sys.argv) > 2 else ROTATIONS
+
+    # NOTE: Statement echo would dominate the measurement.
+    db_engine.echo = False
+
+    await create_db()
+    await db.init_cache()
+    user_id, device_id = await _create_owner()
+
+    print(f"{workers} workers x {rotations} rotations, {s.FASTAPI_ENV} database")
+    print(f"{'store':<8}{'rotations/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+
+    try:
+        await _run(
+            "sql",
+            lambda session, _: SQLRefreshTokenStore(AuthDAO(session)),
+            user_id,
+            device_id,
+            workers,
+            rotations,
+        )
+        await _run(
+            "redis",
+            lambda _, cache: RedisRefreshTokenStore(cache),
+            user_id,
+            device_id,
+            workers,
+            rotations,
+        )
+    finally:
+        await _delete_owner(user_id)
+        await db.close_cache()
+        await db_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""Cached user encoding benchmark.
+
+Compares the JSON entries validated back into a `User`, as the user cache
+used to store them, with the binary `CachedUser` encoding: the size of one
+Redis entry, and the CPU time of encoding and decoding it. Nothing is sent to
+Redis, the benchmark only needs the settings from `server/.env`. Run it from
+the project root:
+
+    python -m benchmarks.user_cache [iterations]
+"""
+
+import sys
+from time import perf_counter
+from typing import Callable
+
+import orjson as json
+from server.db.user.cache import CachedUser
+from server.db.user.cache import decode_user
+from server.db.user.cache import encode_user
+from server.db.user.schema import User
+from server.db.user.schema import UserRole
+from server.utils import cuid
+from server.utils import nowutc
+
+ITERATIONS = 100_000
+
+
+def _measure(operation: Callable[[], object], iterations: int) -> float:
+    operation()
+
+    started_at = perf_counter()
+    for _ in range(iterations):
+        operation()
+    return (perf_counter() - started_at) / iterations * 1_000_000
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else ITERATIONS
+
+    user = User(
+        id=cuid(),
+        first_name="Benchmark",
+        last_name="Encoding",
+        email="benchmark.encoding@example.com",
+        password="$argon2id$v=19$m=65536,t=3,p=4$" + "x" * 66,
+        role=UserRole.USER,
+        verified=nowutc(),
+        created_at=nowutc(),
+        updated_at=nowutc(),
+    )
+    cached_user = CachedUser.from_row(user.model_dump())
+
+    json_entry = json.dumps(user.model_dump()).decode("utf-8")
+    binary_entry = encode_user(cached_user)
+
+    encodings = {
+        "json + User": (
+            len(json_entry.encode()),
+            lambda: json.dumps(user.model_dump()).decode("utf-8"),
+            lambda: User.model_validate(json.loads(json_entry)),
+        ),
+        "binary": (
+            len(binary_entry),
+            lambda: encode_user(cached_user),
+            lambda: decode_user(binary_entry),
+        ),
+    }
+
+    print(f"{iterations} iterations per operation")
+    print(f"{'encoding':<16}{'bytes':>10}{'encode us':>12}{'decode us':>12}")
+
+    for name, (size, encode, decode) in encodings.items():
+        print(
+            f"{name:<16}{size:>10}{_measure(encode, iterations):>12.2f}{_measure(decode, iterations):>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
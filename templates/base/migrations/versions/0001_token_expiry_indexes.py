@@ -0,0 +1,55 @@
+"""Index token expiry for the expired token sweeper
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+
+from typing import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# NOTE: Indexes are built concurrently so the token tables stay writable, which cannot run inside a transaction.
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_refresh_tokens_expires_at",
+            "refresh_tokens",
+            ["expires_at"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_validation_tokens_expires_at",
+            "validation_tokens",
+            ["expires_at"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_validation_tokens_expires_at",
+            table_name="validation_tokens",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_refresh_tokens_expires_at",
+            table_name="refresh_tokens",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
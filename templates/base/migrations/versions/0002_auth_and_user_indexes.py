@@ -0,0 +1,54 @@
+"""Index foreign keys and lookup columns of the auth and user tables
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+
+from typing import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# NOTE: (name, table, columns), built concurrently outside of a transaction like 0001.
+INDEXES = (
+    ("ix_refresh_tokens_user_id", "refresh_tokens", ["user_id"]),
+    ("ix_refresh_tokens_device_id", "refresh_tokens", ["device_id"]),
+    ("ix_devices_user_id", "devices", ["user_id"]),
+    (
+        "ix_validation_tokens_user_id_token_type",
+        "validation_tokens",
+        ["user_id", "token_type"],
+    ),
+    ("ix_users_last_name_id", "users", ["last_name", "id"]),
+)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
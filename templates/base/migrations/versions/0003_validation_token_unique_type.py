@@ -0,0 +1,84 @@
+"""Allow a single validation token per user and token type
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+
+from typing import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# NOTE: Racing re-issues could leave several tokens of a type behind, only the latest one is kept.
+DEDUPE_VALIDATION_TOKENS = """
+DELETE FROM validation_tokens AS older
+USING validation_tokens AS newer
+WHERE older.user_id = newer.user_id
+  AND older.token_type = newer.token_type
+  AND (older.expires_at, older.token) < (newer.expires_at, newer.token)
+"""
+
+# NOTE: create_all already creates the constraint on fresh databases, it is only attached when missing.
+ATTACH_UNIQUE_CONSTRAINT = """
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'uq_validation_tokens_user_id_token_type'
+    ) THEN
+        ALTER TABLE validation_tokens
+            ADD CONSTRAINT uq_validation_tokens_user_id_token_type
+            UNIQUE USING INDEX uq_validation_tokens_user_id_token_type;
+    END IF;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    # NOTE: The unique index is built concurrently, then attached as the constraint under a brief lock.
+    # A concurrent build cannot hold a table lock, so the dedupe runs right before it to leave re-issues no time to add a duplicate back.
+    with op.get_context().autocommit_block():
+        op.execute(DEDUPE_VALIDATION_TOKENS)
+        op.create_index(
+            "uq_validation_tokens_user_id_token_type",
+            "validation_tokens",
+            ["user_id", "token_type"],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+    op.execute(ATTACH_UNIQUE_CONSTRAINT)
+
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_validation_tokens_user_id_token_type",
+            table_name="validation_tokens",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_validation_tokens_user_id_token_type",
+            "validation_tokens",
+            ["user_id", "token_type"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+    op.drop_constraint(
+        "uq_validation_tokens_user_id_token_type", "validation_tokens", type_="unique"
+    )
@@ -7,12 +7,17 @@ from server.db import close_cache
 from server.db import create_db
 from server.db import init_cache
 from server.exceptions import register_exceptions
+from server.maintenance import start_token_sweeper
+from server.maintenance import stop_token_sweeper
 from server.middlewares import register_middlewares
 from server.routes import auth
 from server.routes import health
 from server.routes import user
 from server.services.auth.dependencies import get_current_active_user
+from server.services.email import init_email_service
 from server.utils.core.logging.logger import setup_logger
+from server.utils.security import close_password_manager
+from server.utils.security import init_password_manager
 
 
 @asynccontextmanager
@@ -21,10 +26,15 @@ async def lifespan(app: FastAPI):
 
     await create_db()
     await init_cache()
+    init_password_manager()
+    init_email_service()
+    start_token_sweeper()
 
     try:
         yield
     finally:
+        await stop_token_sweeper()
+        close_password_manager()
         await close_cache()
 
 
@@ -1,5 +1,6 @@
 from functools import lru_cache
 from typing import List
+from typing import Literal
 
 from pydantic_settings import BaseSettings
 from pydantic_settings import SettingsConfigDict
@@ -19,18 +20,50 @@ class Settings(BaseSettings):
     # Database Configuration
     DEV_DATABASE_URL: str
     PROD_DATABASE_URL: str
+    REPLICA_DATABASE_URL: str | None = None
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = False
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    DB_JIT: bool = False
+    DB_PGBOUNCER: bool = False
 
     REDIS_HOST: str
     REDIS_PORT: int
     REDIS_PASSWORD: str
     CACHE_EXPIRATION_TIME: int = 3600
+    CACHE_EXPIRATION_JITTER: float = 0.1
+    CACHE_REFILL_LOCK_SECONDS: float = 5.0
+    CACHE_REFILL_WAIT_SECONDS: float = 1.0
+    CACHE_REFILL_POLL_SECONDS: float = 0.05
+    LOCAL_CACHE_MAX_SIZE: int = 10000
+    LOCAL_CACHE_EXPIRATION_TIME: int = 30
+
+    DEFAULT_PAGE_SIZE: int = 50
+    MAX_PAGE_SIZE: int = 200
+    EXPORT_BATCH_SIZE: int = 1000
 
     # Auth Configuration
     AUTH_SECRET: str
     VERIFICATION_TOKEN_EXPIRE_MINUTES: int
     PASSWORD_RESET_TOKEN_EXPIRE_MINUTES: int
     REFRESH_TOKEN_EXPIRE_MINUTES: int
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS: int = 10
+    REFRESH_TOKEN_STORE: Literal["sql", "redis"] = "sql"
+    VALIDATION_TOKEN_STORE: Literal["sql", "redis"] = "sql"
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    STATELESS_ACCESS_TOKENS: bool = False
+    ACCESS_TOKEN_CACHE_SIZE: int = 10000
+    JWT_CODEC: Literal["jose", "pyjwt"] = "jose"
+    PASSWORD_HASHER_WORKERS: int | None = None
+    PASSWORD_HASHER_MAX_PENDING: int = 64
+
+    # Maintenance Configuration
+    TOKEN_SWEEPER_INTERVAL_SECONDS: int = 300
+    TOKEN_SWEEPER_BATCH_SIZE: int = 1000
 
     # Email Configuration (from env)
     MAIL_USERNAME: str | None
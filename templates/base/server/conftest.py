@@ -13,6 +13,7 @@ from server.db.user.schema import User
 from server.db.user.schema import UserRole
 from server.exceptions import register_exceptions
 from server.models import AccessTokenResponse
+from server.models import AuthResponse
 from server.models import LoginRequest
 from server.models import RefreshTokenData
 from server.models import RefreshTokenResponse
@@ -219,6 +220,7 @@ def admin_user():
         "role": UserRole.ADMIN,
         "verified": mock_admin.verified.isoformat(),
     }
+    return mock_admin
 
 
 @pytest.fixture
@@ -257,6 +259,19 @@ def sample_refresh_token_login_response():
     )
 
 
+@pytest.fixture
+def sample_auth_response(
+    sample_access_token_response,
+    sample_refresh_token_login_response,
+    sample_new_user_response,
+):
+    return AuthResponse(
+        access_token=sample_access_token_response,
+        refresh_token=sample_refresh_token_login_response,
+        user=sample_new_user_response,
+    )
+
+
 # NOTE: Refresh token fixtures:
 
 
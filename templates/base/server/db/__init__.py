@@ -1,7 +1,18 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from redis import asyncio as aioredis
 from server.config import settings as s
+from server.db.cache import LocalCache
+from server.db.cache import SingleFlight
+from server.db.cache import listen_for_invalidations
+from server.db.pool import engine_options
+from server.db.session import LazySession
+from server.db.session import ReadRouting
+from server.db.session import routing_session
 from server.exceptions.health import CacheHealthCheckFailedException
 from server.exceptions.health import DatabaseHealthCheckFailedException
+from server.utils.core.metrics import register_metrics
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel
 from sqlmodel import literal_column
@@ -17,8 +28,21 @@ DB_URL = s.DEV_DATABASE_URL if ENV else s.PROD_DATABASE_URL
 db_engine = create_async_engine(
     url=DB_URL,
     echo=ENV,
+    **engine_options(s),
+)
+# NOTE: Read through the engine, dispose() swaps the pool for a fresh one.
+register_metrics("db_pool", lambda: db_engine.pool.stats())
+
+# NOTE: Optional read replica, only the DAO reads executed with REPLICA_READ are sent to it.
+replica_engine = (
+    create_async_engine(url=s.REPLICA_DATABASE_URL, echo=ENV, **engine_options(s))
+    if s.REPLICA_DATABASE_URL
+    else None
 )
 
+if replica_engine:
+    register_metrics("db_replica_pool", lambda: replica_engine.pool.stats())
+
 
 async def create_db():
     async with db_engine.begin() as connection:
@@ -26,23 +50,65 @@ async def create_db():
 
 
 async def get_session():
-    Session = AsyncSession(db_engine, expire_on_commit=False)
-    async with Session as session:
+    # NOTE: One unit of work per request, DAOs only flush and the request commits once on success.
+    session = LazySession(db_engine, replica_engine)
+    try:
+        yield session
+        await session.complete()
+    except Exception:
+        await session.abort()
+        raise
+    finally:
+        await session.release()
+
+
+@asynccontextmanager
+async def open_session():
+    # NOTE: For work outliving the request's unit of work, such as a streamed response body.
+    async with routing_session(
+        db_engine, ReadRouting(replica_engine), expire_on_commit=False
+    ) as session:
         yield session
 
 
 async def check_database():
-    async with AsyncSession(db_engine) as session:
-        result = await session.exec(select(literal_column("1")))
+    for engine in (db_engine, replica_engine):
+        if not engine:
+            continue
+
+        async with AsyncSession(engine) as session:
+            result = await session.exec(select(literal_column("1")))
 
-        if not result.first():
-            raise DatabaseHealthCheckFailedException()
+            if not result.first():
+                raise DatabaseHealthCheckFailedException()
 
 
 # NOTE: Cache layer is managed with Redis:
 
 cache: aioredis.Redis | None = None
 
+# NOTE: Binary cache entries, such as the encoded users, are read through a client returning raw bytes:
+
+raw_cache: aioredis.Redis | None = None
+
+# NOTE: In-process tier in front of Redis, kept in sync across workers through pub/sub:
+
+local_cache = LocalCache(
+    max_size=s.LOCAL_CACHE_MAX_SIZE, ttl=s.LOCAL_CACHE_EXPIRATION_TIME
+)
+register_metrics("local_cache", local_cache.stats)
+
+# NOTE: Coalesces the concurrent refills of a missed key, in the worker and across workers:
+
+user_flights = SingleFlight(
+    lock_ttl=s.CACHE_REFILL_LOCK_SECONDS,
+    wait_timeout=s.CACHE_REFILL_WAIT_SECONDS,
+    poll_interval=s.CACHE_REFILL_POLL_SECONDS,
+)
+register_metrics("user_cache_refills", user_flights.stats)
+
+_invalidation_listener: asyncio.Task | None = None
+
 
 async def get_cache():
     if not cache:
@@ -50,8 +116,25 @@ async def get_cache():
     return cache
 
 
+async def get_raw_cache():
+    if not raw_cache:
+        raise CacheHealthCheckFailedException()
+    return raw_cache
+
+
+def get_local_cache() -> LocalCache:
+    return local_cache
+
+
+def get_user_flights() -> SingleFlight:
+    return user_flights
+
+
 async def init_cache():
     global cache
+    global raw_cache
+    global _invalidation_listener
+
     cache = aioredis.Redis(
         host=s.REDIS_HOST,
         port=s.REDIS_PORT,
@@ -60,14 +143,33 @@ async def init_cache():
         encoding="utf-8",
         decode_responses=True,
     )
+    raw_cache = aioredis.Redis(
+        host=s.REDIS_HOST,
+        port=s.REDIS_PORT,
+        db=0,
+        password=s.REDIS_PASSWORD,
+        decode_responses=False,
+    )
+    _invalidation_listener = asyncio.create_task(
+        listen_for_invalidations(cache, local_cache)
+    )
 
 
 async def close_cache():
     global cache
+    global raw_cache
+    global _invalidation_listener
+
+    if _invalidation_listener:
+        _invalidation_listener.cancel()
+        _invalidation_listener = None
 
     if cache:
         await cache.close()
 
+    if raw_cache:
+        await raw_cache.close()
+
 
 async def check_cache():
     global cache
@@ -1,9 +1,13 @@
+from datetime import datetime
 from typing import Sequence
+from typing import Tuple
 
 from server.db.auth.schema import Device
 from server.db.auth.schema import RefreshToken
 from server.db.auth.schema import ValidationToken
-from server.db.auth.schema import ValidationTokenType
+from server.db.session import PRIMARY_WRITE
+from server.db.session import REPLICA_READ
+from server.db.user.schema import User
 from server.exceptions.auth import DeviceNotCreatedException
 from server.exceptions.auth import DeviceNotFoundException
 from server.exceptions.auth import TokenNotCreatedException
@@ -12,7 +16,13 @@ from server.models import DeviceData
 from server.models import RefreshTokenData
 from server.models import UpdateDeviceData
 from server.models import ValidationTokenData
+from server.utils import cuid
+from server.utils import nowutc
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import delete
+from sqlmodel import literal
 from sqlmodel import select
+from sqlmodel import update
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 
@@ -36,9 +46,8 @@ class AuthDAO:
     async def insert_refresh_token(self, token_data: RefreshTokenData):
         try:
             self.session.add(RefreshToken(**token_data.model_dump()))
-            await self.session.commit()
+            await self.session.flush()
         except Exception as e:
-            await self.session.rollback()
             raise TokenNotCreatedException() from e
 
     async def delete_refresh_token(self, jti: str):
@@ -48,66 +57,84 @@ class AuthDAO:
             raise TokenNotFoundException()
 
         await self.session.delete(token)
-        await self.session.commit()
+        await self.session.flush()
 
-    # NOTE: Validation tokens DAO methods:
-    async def get_validation_token(self, token: str):
-        token_data = await self.session.exec(
-            select(ValidationToken).where(ValidationToken.token == token)
-        )
-        return token_data.first()
-
-    async def get_validation_token_by_user_id_and_type(
-        self, user_id: str, token_type: ValidationTokenType
-    ):
-        token_data = await self.session.exec(
-            select(ValidationToken).where(
-                ValidationToken.user_id == user_id,
-                ValidationToken.token_type == token_type,
-            )
+    async def delete_refresh_tokens_by_user_id(self, user_id: str) -> None:
+        await self.session.exec(
+            delete(RefreshToken).where(RefreshToken.user_id == user_id)
         )
-        return token_data.first()
 
-    async def insert_validation_token(self, token_data: ValidationTokenData):
-        try:
-            self.session.add(ValidationToken(**token_data.model_dump()))
-            await self.session.commit()
-        except Exception as e:
-            await self.session.rollback()
-            raise TokenNotCreatedException() from e
+    async def delete_refresh_tokens_by_device_id(self, device_id: str) -> None:
+        await self.session.exec(
+            delete(RefreshToken).where(RefreshToken.device_id == device_id)
+        )
 
-        return token_data
+    async def rotate_refresh_token(
+        self, jti: str, new_jti: str, expires_at: datetime
+    ) -> Tuple[User, str] | None:
+        """Swap a live refresh token for its successor in one statement. Returns the owner and the device id, or None when the token is unknown or expired."""
+        old_token = (
+            delete(RefreshToken)
+            .where(RefreshToken.jti == jti, RefreshToken.expires_at > nowutc())
+            .returning(RefreshToken.user_id, RefreshToken.device_id)
+            .cte("old_token")
+        )
+        new_token = (
+            insert(RefreshToken)
+            .from_select(
+                ["jti", "user_id", "device_id", "expires_at"],
+                select(
+                    literal(new_jti),
+                    old_token.c.user_id,
+                    old_token.c.device_id,
+                    literal(expires_at),
+                ),
+            )
+            .returning(RefreshToken.user_id, RefreshToken.device_id)
+            .cte("new_token")
+        )
 
-    async def delete_validation_token(self, token_str: str):
         result = await self.session.exec(
-            select(ValidationToken).where(ValidationToken.token == token_str)
+            select(User, new_token.c.device_id).join(
+                new_token, User.id == new_token.c.user_id
+            ),
+            bind_arguments=PRIMARY_WRITE,
         )
-        token = result.first()
+        rotated = result.first()
 
-        if not token:
-            raise TokenNotFoundException()
+        if not rotated:
+            return None
 
-        await self.session.delete(token)
-        await self.session.commit()
+        user, device_id = rotated
+        return user, device_id
 
-    # NOTE: Devices DAO methods:
+    # NOTE: Validation tokens DAO methods:
+    async def upsert_validation_token(self, token_data: ValidationTokenData) -> None:
+        """Issue the token, replacing any previous token of the same type for the user in one statement."""
+        statement = insert(ValidationToken).values(**token_data.model_dump())
+        statement = statement.on_conflict_do_update(
+            index_elements=[ValidationToken.user_id, ValidationToken.token_type],
+            set_={
+                "token": statement.excluded.token,
+                "expires_at": statement.excluded.expires_at,
+            },
+        )
 
-    async def get_device_id(
-        self, raw_user_agent: str, ip_address: str, user_id: str
-    ) -> str | None:
+        try:
+            await self.session.exec(statement)
+        except Exception as e:
+            raise TokenNotCreatedException() from e
+
+    async def consume_validation_token(self, token_str: str) -> ValidationToken | None:
+        """Delete the token and return it in one statement, so it can only be used once."""
         result = await self.session.exec(
-            select(Device).where(
-                Device.raw_user_agent == raw_user_agent,
-                Device.ip_address == ip_address,
-                Device.user_id == user_id,
-            )
+            delete(ValidationToken)
+            .where(ValidationToken.token == token_str)
+            .returning(ValidationToken)
         )
-        device = result.first()
+        return result.scalar_one_or_none()
 
-        if not device:
-            return None
-
-        return device.id
+    # NOTE: Devices DAO methods:
 
     async def get_device_by_id(self, device_id: str) -> Device | None:
         device = await self.session.exec(select(Device).where(Device.id == device_id))
@@ -116,44 +143,46 @@ class AuthDAO:
 
     async def get_devices_by_user_id(self, user_id: str) -> Sequence[Device]:
         devices = await self.session.exec(
-            select(Device).where(Device.user_id == user_id)
+            select(Device).where(Device.user_id == user_id),
+            bind_arguments=REPLICA_READ,
         )
         return devices.all()
 
-    async def insert_device(self, device_data: DeviceData) -> str:
+    async def upsert_device(self, device_data: DeviceData) -> str:
+        """Insert the device or bump its last_seen in a single round trip, keyed on the (user agent, ip, user) unique index."""
+        statement = insert(Device).values(id=cuid(), **device_data.model_dump())
+        statement = statement.on_conflict_do_update(
+            index_elements=[Device.raw_user_agent, Device.ip_address, Device.user_id],
+            set_={"last_seen": statement.excluded.last_seen},
+        ).returning(Device.id)
+
         try:
-            new_device = Device(**device_data.model_dump())
-            self.session.add(new_device)
-            await self.session.commit()
-            await self.session.refresh(new_device)
-            return new_device.id
+            result = await self.session.exec(statement)
+            return result.scalar_one()
         except Exception as e:
-            await self.session.rollback()
             raise DeviceNotCreatedException() from e
 
     async def update_device(
         self, device_id: str, update_device_data: UpdateDeviceData
-    ) -> None:
-        device = await self.get_device_by_id(device_id)
+    ) -> Device:
+        """Update the provided fields in a single UPDATE ... RETURNING round trip."""
+        values = update_device_data.model_dump(exclude_none=True)
+
+        if not values:
+            device = await self.get_device_by_id(device_id)
+        else:
+            result = await self.session.exec(
+                update(Device)
+                .where(Device.id == device_id)
+                .values(**values)
+                .returning(Device)
+            )
+            device = result.scalar_one_or_none()
 
         if not device:
             raise DeviceNotFoundException()
 
-        for key, value in update_device_data.model_dump(exclude_none=True).items():
-            if value is not None:
-                setattr(device, key, value)
-
-        self.session.add(device)
-        await self.session.commit()
-
-    async def delete_user_devices(self, user_id: str) -> None:
-        devices = await self.get_devices_by_user_id(user_id)
-
-        if not devices:
-            raise DeviceNotFoundException()
-
-        await self.session.delete(devices)
-        await self.session.commit()
+        return device
 
     async def delete_device(self, device_id: str) -> None:
         device = await self.get_device_by_id(device_id)
@@ -162,4 +191,4 @@ class AuthDAO:
             raise DeviceNotFoundException()
 
         await self.session.delete(device)
-        await self.session.commit()
+        await self.session.flush()
@@ -8,6 +8,7 @@ from sqlmodel import Column
 from sqlmodel import Field
 from sqlmodel import Index
 from sqlmodel import SQLModel
+from sqlmodel import UniqueConstraint
 
 
 class ValidationTokenType(str, Enum):
@@ -17,6 +18,11 @@ class ValidationTokenType(str, Enum):
 
 class ValidationToken(SQLModel, table=True):
     __tablename__ = "validation_tokens"
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "token_type", name="uq_validation_tokens_user_id_token_type"
+        ),
+    )
     user_id: str = Field(foreign_key="users.id", primary_key=True, ondelete="CASCADE")
     token: str = Field(
         sa_column=Column(
@@ -27,7 +33,7 @@ class ValidationToken(SQLModel, table=True):
         sa_column=Column(pg.ENUM(ValidationTokenType), nullable=False)
     )
     expires_at: datetime = Field(
-        sa_column=Column(pg.TIMESTAMP(timezone=True), default=nowutc)
+        sa_column=Column(pg.TIMESTAMP(timezone=True), default=nowutc, index=True)
     )
 
 
@@ -36,10 +42,10 @@ class RefreshToken(SQLModel, table=True):
     jti: str = Field(
         sa_column=Column(pg.VARCHAR(length=24), unique=True, primary_key=True)
     )
-    user_id: str = Field(foreign_key="users.id", ondelete="CASCADE")
-    device_id: str = Field(foreign_key="devices.id", ondelete="CASCADE")
+    user_id: str = Field(foreign_key="users.id", ondelete="CASCADE", index=True)
+    device_id: str = Field(foreign_key="devices.id", ondelete="CASCADE", index=True)
     expires_at: datetime = Field(
-        sa_column=Column(pg.TIMESTAMP(timezone=True), default=nowutc)
+        sa_column=Column(pg.TIMESTAMP(timezone=True), default=nowutc, index=True)
     )
 
 
@@ -61,7 +67,7 @@ class Device(SQLModel, table=True):
             primary_key=True,
         ),
     )
-    user_id: str = Field(foreign_key="users.id", ondelete="CASCADE")
+    user_id: str = Field(foreign_key="users.id", ondelete="CASCADE", index=True)
     browser: str = Field(
         sa_column=Column(
             pg.VARCHAR(length=50),
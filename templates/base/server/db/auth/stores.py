@@ -0,0 +1,288 @@
+from abc import ABC
+from abc import abstractmethod
+from datetime import datetime
+from typing import Tuple
+
+from redis import asyncio as aioredis
+from server.db.auth.dao import AuthDAO
+from server.db.session import LazySession
+from server.db.user.schema import User
+from server.exceptions.auth import TokenNotCreatedException
+from server.exceptions.auth import TokenNotFoundException
+from server.models import RefreshTokenData
+from server.models import ValidationTokenData
+from server.utils import nowutc
+
+
+class RefreshTokenStore(ABC):
+    """Persistence for issued refresh tokens, keyed by their jti."""
+
+    @abstractmethod
+    async def insert(self, token_data: RefreshTokenData) -> None: ...
+
+    @abstractmethod
+    async def get(self, jti: str) -> RefreshTokenData | None: ...
+
+    @abstractmethod
+    async def delete(self, jti: str) -> None: ...
+
+    @abstractmethod
+    async def rotate(
+        self, jti: str, new_jti: str, expires_at: datetime
+    ) -> Tuple[str, str, User | None] | None:
+        """Swap a live refresh token for its successor. Returns the user id, the device id and the owner when the backend can load it in the same round trip, or None when the token is unknown or expired."""
+
+    @abstractmethod
+    async def delete_user_tokens(self, user_id: str) -> None: ...
+
+    @abstractmethod
+    async def delete_device_tokens(self, device_id: str) -> None: ...
+
+
+class SQLRefreshTokenStore(RefreshTokenStore):
+    """Refresh tokens stored in the refresh_tokens table, part of the request's unit of work."""
+
+    def __init__(self, auth_dao: AuthDAO):
+        self._auth_dao = auth_dao
+
+    async def insert(self, token_data: RefreshTokenData) -> None:
+        await self._auth_dao.insert_refresh_token(token_data)
+
+    async def get(self, jti: str) -> RefreshTokenData | None:
+        try:
+            token = await self._auth_dao.get_refresh_token_by_jti(jti)
+        except TokenNotFoundException:
+            return None
+
+        return RefreshTokenData(**token.model_dump())
+
+    async def delete(self, jti: str) -> None:
+        await self._auth_dao.delete_refresh_token(jti)
+
+    async def rotate(
+        self, jti: str, new_jti: str, expires_at: datetime
+    ) -> Tuple[str, str, User | None] | None:
+        rotated = await self._auth_dao.rotate_refresh_token(jti, new_jti, expires_at)
+
+        if not rotated:
+            return None
+
+        user, device_id = rotated
+        return user.id, device_id, user
+
+    async def delete_user_tokens(self, user_id: str) -> None:
+        await self._auth_dao.delete_refresh_tokens_by_user_id(user_id)
+
+    async def delete_device_tokens(self, device_id: str) -> None:
+        await self._auth_dao.delete_refresh_tokens_by_device_id(device_id)
+
+
+class RedisRefreshTokenStore(RefreshTokenStore):
+    """Refresh tokens stored as Redis keys expiring with the token, indexed by user and device for bulk revocation."""
+
+    # NOTE: Writes are applied immediately and are not rolled back with the request's database transaction.
+
+    def __init__(self, cache: aioredis.Redis):
+        self._cache = cache
+
+    async def insert(self, token_data: RefreshTokenData) -> None:
+        ttl = self._ttl(token_data.expires_at)
+
+        if ttl <= 0:
+            raise TokenNotCreatedException()
+
+        try:
+            async with self._cache.pipeline(transaction=True) as pipe:
+                pipe.set(
+                    self._token_key(token_data.jti),
+                    token_data.model_dump_json(),
+                    ex=ttl,
+                )
+                self._index(pipe, token_data, ttl)
+                await pipe.execute()
+        except aioredis.RedisError as e:
+            raise TokenNotCreatedException() from e
+
+    async def get(self, jti: str) -> RefreshTokenData | None:
+        cached = await self._cache.get(self._token_key(jti))
+        return RefreshTokenData.model_validate_json(cached) if cached else None
+
+    async def delete(self, jti: str) -> None:
+        cached = await self._cache.getdel(self._token_key(jti))
+
+        if not cached:
+            raise TokenNotFoundException()
+
+        await self._unindex(RefreshTokenData.model_validate_json(cached))
+
+    async def rotate(
+        self, jti: str, new_jti: str, expires_at: datetime
+    ) -> Tuple[str, str, User | None] | None:
+        # NOTE: GETDEL hands the old token to exactly one of several concurrent rotations.
+        cached = await self._cache.getdel(self._token_key(jti))
+
+        if not cached:
+            return None
+
+        old_token = RefreshTokenData.model_validate_json(cached)
+        new_token = RefreshTokenData(
+            jti=new_jti,
+            user_id=old_token.user_id,
+            device_id=old_token.device_id,
+            expires_at=expires_at,
+        )
+        ttl = self._ttl(expires_at)
+
+        try:
+            async with self._cache.pipeline(transaction=True) as pipe:
+                pipe.set(self._token_key(new_jti), new_token.model_dump_json(), ex=ttl)
+                pipe.srem(self._user_key(old_token.user_id), jti)
+                pipe.srem(self._device_key(old_token.device_id), jti)
+                self._index(pipe, new_token, ttl)
+                await pipe.execute()
+        except aioredis.RedisError as e:
+            raise TokenNotCreatedException() from e
+
+        return new_token.user_id, new_token.device_id, None
+
+    async def delete_user_tokens(self, user_id: str) -> None:
+        await self._delete_indexed(self._user_key(user_id))
+
+    async def delete_device_tokens(self, device_id: str) -> None:
+        await self._delete_indexed(self._device_key(device_id))
+
+    async def _delete_indexed(self, index_key: str) -> None:
+        jtis = await self._cache.smembers(index_key)
+
+        async with self._cache.pipeline(transaction=True) as pipe:
+            for jti in jtis:
+                pipe.delete(self._token_key(jti))
+            pipe.delete(index_key)
+            await pipe.execute()
+
+    async def _unindex(self, token_data: RefreshTokenData) -> None:
+        async with self._cache.pipeline(transaction=True) as pipe:
+            pipe.srem(self._user_key(token_data.user_id), token_data.jti)
+            pipe.srem(self._device_key(token_data.device_id), token_data.jti)
+            await pipe.execute()
+
+    def _index(self, pipe, token_data: RefreshTokenData, ttl: int) -> None:
+        # NOTE: The index sets live as long as their newest token, expired members are left behind and are harmless to delete.
+        for index_key in (
+            self._user_key(token_data.user_id),
+            self._device_key(token_data.device_id),
+        ):
+            pipe.sadd(index_key, token_data.jti)
+            pipe.expire(index_key, ttl, gt=True)
+            pipe.expire(index_key, ttl, nx=True)
+
+    def _ttl(self, expires_at: datetime) -> int:
+        return int((expires_at - nowutc()).total_seconds())
+
+    def _token_key(self, jti: str) -> str:
+        return f"refresh_token:{jti}"
+
+    def _user_key(self, user_id: str) -> str:
+        return f"refresh_tokens:user:{user_id}"
+
+    def _device_key(self, device_id: str) -> str:
+        return f"refresh_tokens:device:{device_id}"
+
+
+class ValidationTokenStore(ABC):
+    """Persistence for one-shot verification and password reset tokens, one live token per user and type."""
+
+    @abstractmethod
+    async def issue(self, token_data: ValidationTokenData) -> None:
+        """Store the token, replacing the user's previous token of the same type."""
+
+    @abstractmethod
+    async def consume(self, token: str) -> ValidationTokenData | None:
+        """Use the token up and return it, None when it is unknown or was already used. It is only gone for good once the request's unit of work commits."""
+
+
+class SQLValidationTokenStore(ValidationTokenStore):
+    """Validation tokens stored in the validation_tokens table, part of the request's unit of work."""
+
+    def __init__(self, auth_dao: AuthDAO):
+        self._auth_dao = auth_dao
+
+    async def issue(self, token_data: ValidationTokenData) -> None:
+        await self._auth_dao.upsert_validation_token(token_data)
+
+    async def consume(self, token: str) -> ValidationTokenData | None:
+        validation_token = await self._auth_dao.consume_validation_token(token)
+        return (
+            ValidationTokenData(**validation_token.model_dump())
+            if validation_token
+            else None
+        )
+
+
+class RedisValidationTokenStore(ValidationTokenStore):
+    """Validation tokens stored as Redis keys expiring with the token, with a per user and type pointer to the live one."""
+
+    # NOTE: Expired tokens disappear with their key, they are reported as unknown rather than expired.
+
+    # NOTE: Long enough to cover the request consuming the token. A request failing before its commit hands the
+    # token back once the claim expires.
+    CLAIM_SECONDS = 60
+
+    def __init__(self, cache: aioredis.Redis, session: LazySession):
+        self._cache = cache
+        self._session = session
+
+    async def issue(self, token_data: ValidationTokenData) -> None:
+        ttl = int((token_data.expires_at - nowutc()).total_seconds())
+
+        if ttl <= 0:
+            raise TokenNotCreatedException()
+
+        try:
+            async with self._cache.pipeline(transaction=True) as pipe:
+                pipe.set(
+                    self._token_key(token_data.token),
+                    token_data.model_dump_json(),
+                    ex=ttl,
+                )
+                pipe.set(
+                    self._pointer_key(token_data.user_id, token_data.token_type),
+                    token_data.token,
+                    ex=ttl,
+                    get=True,
+                )
+                _, previous_token = await pipe.execute()
+
+            if previous_token and previous_token != token_data.token:
+                await self._cache.delete(self._token_key(previous_token))
+        except aioredis.RedisError as e:
+            raise TokenNotCreatedException() from e
+
+    async def consume(self, token: str) -> ValidationTokenData | None:
+        # NOTE: SET NX hands the token to exactly one of several concurrent requests. The key itself is only deleted
+        # after the commit, so a password update failing on the way leaves the link usable.
+        if not await self._cache.set(
+            self._claim_key(token), 1, nx=True, ex=self.CLAIM_SECONDS
+        ):
+            return None
+
+        cached = await self._cache.get(self._token_key(token))
+
+        if not cached:
+            return None
+
+        async def _delete_token() -> None:
+            # NOTE: The pointer is left to expire, re-issuing only deletes a token key that is already gone.
+            await self._cache.delete(self._token_key(token), self._claim_key(token))
+
+        self._session.after_commit(_delete_token)
+        return ValidationTokenData.model_validate_json(cached)
+
+    def _token_key(self, token: str) -> str:
+        return f"validation_token:{token}"
+
+    def _pointer_key(self, user_id: str, token_type: str) -> str:
+        return f"validation_tokens:user:{user_id}:{token_type}"
+
+    def _claim_key(self, token: str) -> str:
+        return f"validation_token_claim:{token}"
@@ -0,0 +1,223 @@
+import asyncio
+from collections import OrderedDict
+from random import randint
+from time import monotonic
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import Tuple
+from typing import TypeVar
+
+from redis import asyncio as aioredis
+from server.utils.core.logging.logger import logger
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+T = TypeVar("T")
+
+
+class LocalCache:
+    """Bounded in-process LRU cache with a per-entry time to live."""
+
+    def __init__(self, max_size: int, ttl: int):
+        self._entries: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+        self._max_size = max_size
+        self._ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+
+        if expires_at <= monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: int | None = None) -> None:
+        if self._max_size <= 0:
+            return
+
+        self._entries[key] = (monotonic() + (ttl or self._ttl), value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "max_size": self._max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def jittered_ttl(ttl: int, jitter: float) -> int:
+    """Shorten the TTL by a random share of up to `jitter`, so entries written together do not expire together."""
+    return ttl - randint(0, int(ttl * jitter))
+
+
+class SingleFlight:
+    """Coalesces the concurrent refills of a cache key into a single load.
+
+    Within the worker, the callers missing the same key await one shared
+    loading task. Across workers, a short Redis lock elects the worker that
+    loads: the others poll the cache for the refilled entry, and only load
+    themselves when the lock holder has not delivered within `wait_timeout`.
+    """
+
+    def __init__(self, lock_ttl: float, wait_timeout: float, poll_interval: float):
+        self._flights: Dict[str, asyncio.Task] = {}
+        self._lock_ttl = lock_ttl
+        self._wait_timeout = wait_timeout
+        self._poll_interval = poll_interval
+
+        self.loads = 0
+        self.coalesced = 0
+        self.lock_waits = 0
+        self.lock_timeouts = 0
+
+    async def load(
+        self,
+        cache: aioredis.Redis,
+        key: str,
+        read: Callable[[], Awaitable[T | None]],
+        fill: Callable[[], Awaitable[T]],
+    ) -> T:
+        """Get the value of a missed key. `read` returns the cached value or None, `fill` loads it and writes it to the cache."""
+        flight = self._flights.get(key)
+
+        if flight is None:
+            flight = asyncio.ensure_future(self._load(cache, key, read, fill))
+            flight.add_done_callback(lambda done: self._land(key, done))
+            self._flights[key] = flight
+        else:
+            self.coalesced += 1
+
+        # NOTE: Shielded, a caller going away must not cancel the load the other callers are waiting on.
+        return await asyncio.shield(flight)
+
+    def _land(self, key: str, flight: asyncio.Task) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+        # NOTE: Retrieved here, a failure nobody awaited anymore would otherwise be logged as never retrieved.
+        if not flight.cancelled():
+            flight.exception()
+
+    async def _load(
+        self,
+        cache: aioredis.Redis,
+        key: str,
+        read: Callable[[], Awaitable[T | None]],
+        fill: Callable[[], Awaitable[T]],
+    ) -> T:
+        lock_key = f"lock:{key}"
+
+        try:
+            # NOTE: SET NX answers None when another worker holds the lock.
+            locked = bool(
+                await cache.set(lock_key, 1, nx=True, px=int(self._lock_ttl * 1000))
+            )
+        except aioredis.RedisError:
+            # NOTE: Without Redis there is no other worker to coordinate with, load right away.
+            locked = True
+
+        if not locked:
+            self.lock_waits += 1
+            value = await self._wait_for_refill(read)
+
+            if value is not None:
+                return value
+
+            self.lock_timeouts += 1
+
+        try:
+            self.loads += 1
+            return await fill()
+        finally:
+            # NOTE: Released unconditionally, an expired lock taken over by another worker only costs one extra refill.
+            if locked:
+                try:
+                    await cache.delete(lock_key)
+                except aioredis.RedisError:
+                    pass
+
+    async def _wait_for_refill(
+        self, read: Callable[[], Awaitable[T | None]]
+    ) -> T | None:
+        deadline = monotonic() + self._wait_timeout
+
+        while monotonic() < deadline:
+            await asyncio.sleep(self._poll_interval)
+            value = await read()
+
+            if value is not None:
+                return value
+
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "lock_waits": self.lock_waits,
+            "lock_timeouts": self.lock_timeouts,
+        }
+
+
+# NOTE: Cross-worker invalidation is done through Redis pub/sub. Every worker evicts the published keys from its local tier.
+
+
+async def publish_invalidation(cache: aioredis.Redis, key: str) -> None:
+    try:
+        await cache.publish(INVALIDATION_CHANNEL, key)
+    except aioredis.RedisError as e:
+        logger.error(f"Could not publish cache invalidation for {key}: {e}")
+
+
+async def listen_for_invalidations(
+    cache: aioredis.Redis, local_cache: LocalCache, retry_delay: float = 1.0
+) -> None:
+    while True:
+        pubsub = cache.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+
+            # NOTE: Invalidations may have been missed while we were not subscribed.
+            local_cache.clear()
+
+            async for message in pubsub.listen():
+                local_cache.delete(message["data"])
+        except aioredis.RedisError as e:
+            logger.error(f"Cache invalidation listener disconnected: {e}")
+            local_cache.clear()
+            await asyncio.sleep(retry_delay)
+        finally:
+            await pubsub.aclose()
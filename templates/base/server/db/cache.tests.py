@@ -0,0 +1,121 @@
+import asyncio
+from unittest.mock import AsyncMock
+from unittest.mock import patch
+
+import pytest
+from server.db.cache import LocalCache
+from server.db.cache import SingleFlight
+from server.db.cache import jittered_ttl
+
+
+def test_local_cache_hit_and_miss():
+    local_cache = LocalCache(max_size=10, ttl=30)
+
+    assert local_cache.get("user_id:123") is None
+
+    local_cache.set("user_id:123", "user")
+
+    assert local_cache.get("user_id:123") == "user"
+    assert local_cache.hits == 1
+    assert local_cache.misses == 1
+
+
+def test_local_cache_evicts_least_recently_used():
+    local_cache = LocalCache(max_size=2, ttl=30)
+
+    local_cache.set("a", 1)
+    local_cache.set("b", 2)
+
+    # Touch `a` so that `b` becomes the least recently used entry
+    local_cache.get("a")
+    local_cache.set("c", 3)
+
+    assert local_cache.get("b") is None
+    assert local_cache.get("a") == 1
+    assert local_cache.get("c") == 3
+    assert local_cache.evictions == 1
+
+
+def test_local_cache_expires_entries():
+    local_cache = LocalCache(max_size=10, ttl=30)
+
+    with patch("server.db.cache.monotonic", return_value=100.0):
+        local_cache.set("user_id:123", "user")
+
+    with patch("server.db.cache.monotonic", return_value=131.0):
+        assert local_cache.get("user_id:123") is None
+
+    assert local_cache.expirations == 1
+    assert local_cache.stats()["size"] == 0
+
+
+def test_local_cache_delete():
+    local_cache = LocalCache(max_size=10, ttl=30)
+
+    local_cache.set("user_id:123", "user")
+    local_cache.delete("user_id:123")
+
+    assert local_cache.get("user_id:123") is None
+
+
+def test_jittered_ttl_stays_within_the_jitter():
+    ttls = {jittered_ttl(3600, 0.1) for _ in range(200)}
+
+    assert min(ttls) >= 3240
+    assert max(ttls) <= 3600
+    assert len(ttls) > 1
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_misses():
+    single_flight = SingleFlight(lock_ttl=5, wait_timeout=1, poll_interval=0.01)
+    cache = AsyncMock()
+    cache.set.return_value = True
+    loaded = asyncio.Event()
+
+    async def fill():
+        await loaded.wait()
+        return "user"
+
+    callers = [
+        asyncio.create_task(single_flight.load(cache, "user_id:123", AsyncMock(), fill))
+        for _ in range(5)
+    ]
+    await asyncio.sleep(0)
+    loaded.set()
+
+    assert await asyncio.gather(*callers) == ["user"] * 5
+    assert single_flight.stats()["loads"] == 1
+    assert single_flight.stats()["coalesced"] == 4
+    assert single_flight.stats()["in_flight"] == 0
+    cache.delete.assert_awaited_once_with("lock:user_id:123")
+
+
+@pytest.mark.asyncio
+async def test_single_flight_waits_for_the_worker_holding_the_lock():
+    single_flight = SingleFlight(lock_ttl=5, wait_timeout=1, poll_interval=0.01)
+    cache = AsyncMock()
+    cache.set.return_value = None
+    read = AsyncMock(side_effect=[None, "user"])
+    fill = AsyncMock()
+
+    assert await single_flight.load(cache, "user_id:123", read, fill) == "user"
+    assert single_flight.stats()["lock_waits"] == 1
+    fill.assert_not_awaited()
+    cache.delete.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_single_flight_loads_when_the_lock_holder_does_not_deliver():
+    single_flight = SingleFlight(lock_ttl=5, wait_timeout=0.03, poll_interval=0.01)
+    cache = AsyncMock()
+    cache.set.return_value = None
+    fill = AsyncMock(return_value="user")
+
+    result = await single_flight.load(
+        cache, "user_id:123", AsyncMock(return_value=None), fill
+    )
+
+    assert result == "user"
+    assert single_flight.stats()["lock_timeouts"] == 1
+    fill.assert_awaited_once()
@@ -0,0 +1,257 @@
+"""EXPLAIN audit of the DAO queries.
+
+Runs every DAO query listed in `DAO_QUERIES` against the configured database
+inside a transaction that is rolled back, so the writes are audited too,
+captures the SQL it emits and prints the plan of each statement. Sequential
+scans are disabled for the audit, so a Seq Scan left in a plan means no index
+can serve the query. Run it from the project root, it exits with a non-zero
+status when a Seq Scan is found, or when a query fails or emits no statement:
+
+    python -m server.db.explain
+"""
+
+import asyncio
+import json
+import sys
+from contextlib import contextmanager
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Tuple
+
+from server.db import db_engine
+from server.db.auth.dao import AuthDAO
+from server.db.auth.schema import ValidationTokenType
+from server.db.user.dao import UserDAO
+from server.exceptions.auth import DeviceNotFoundException
+from server.exceptions.auth import TokenNotFoundException
+from server.exceptions.user import UserNotFoundException
+from server.models import DeviceData
+from server.models import UpdateDeviceData
+from server.models import UserCreateRequest
+from server.models import UserUpdateRequest
+from server.models import ValidationTokenData
+from server.utils import nowutc
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+SAMPLE_ID = "explain"
+SAMPLE_EMAIL = "explain@example.com"
+
+SAMPLE_VALIDATION_TOKEN = ValidationTokenData(
+    user_id=SAMPLE_ID,
+    token=SAMPLE_ID,
+    expires_at=nowutc(),
+    token_type=ValidationTokenType.VERIFICATION,
+)
+SAMPLE_DEVICE = DeviceData(
+    user_id=SAMPLE_ID,
+    browser=SAMPLE_ID,
+    browser_version=SAMPLE_ID,
+    os=SAMPLE_ID,
+    device_type=SAMPLE_ID,
+    is_mobile=False,
+    is_tablet=False,
+    is_desktop=True,
+    raw_user_agent=SAMPLE_ID,
+    ip_address=SAMPLE_ID,
+    last_seen=nowutc(),
+)
+SAMPLE_USER = UserCreateRequest(
+    first_name=SAMPLE_ID, last_name=SAMPLE_ID, email=SAMPLE_EMAIL, password=SAMPLE_ID
+)
+
+DAOQuery = Callable[[AuthDAO, UserDAO], Awaitable[Any]]
+
+# NOTE: Raised by the DAOs after their statement for the sample rows that do not exist, any other error fails the audit.
+EXPECTED_EXCEPTIONS = (
+    DeviceNotFoundException,
+    TokenNotFoundException,
+    UserNotFoundException,
+)
+
+
+class AuditSession(AsyncSession):
+    """Session of the audited DAOs. Nothing is ever committed, the side effects registered for the commit are dropped."""
+
+    def after_commit(self, callback: Callable[[], Awaitable[None]]) -> None:
+        pass
+
+
+async def _delete_user(users: UserDAO) -> None:
+    # NOTE: The DELETE is only sent for an existing user, the sample user is inserted first.
+    user = await users.insert_user(SAMPLE_USER)
+    await users.delete_user(user.id)
+
+
+# NOTE: Add new DAO queries here so they are covered by the audit.
+DAO_QUERIES: Dict[str, DAOQuery] = {
+    "AuthDAO.get_refresh_token_by_jti": lambda auth, _: auth.get_refresh_token_by_jti(
+        SAMPLE_ID
+    ),
+    "AuthDAO.delete_refresh_tokens_by_user_id": lambda auth, _: (
+        auth.delete_refresh_tokens_by_user_id(SAMPLE_ID)
+    ),
+    "AuthDAO.delete_refresh_tokens_by_device_id": lambda auth, _: (
+        auth.delete_refresh_tokens_by_device_id(SAMPLE_ID)
+    ),
+    "AuthDAO.rotate_refresh_token": lambda auth, _: auth.rotate_refresh_token(
+        SAMPLE_ID, SAMPLE_ID, nowutc()
+    ),
+    "AuthDAO.upsert_validation_token": lambda auth, _: auth.upsert_validation_token(
+        SAMPLE_VALIDATION_TOKEN
+    ),
+    "AuthDAO.consume_validation_token": lambda auth, _: auth.consume_validation_token(
+        SAMPLE_ID
+    ),
+    "AuthDAO.get_device_by_id": lambda auth, _: auth.get_device_by_id(SAMPLE_ID),
+    "AuthDAO.get_devices_by_user_id": lambda auth, _: auth.get_devices_by_user_id(
+        SAMPLE_ID
+    ),
+    "AuthDAO.upsert_device": lambda auth, _: auth.upsert_device(SAMPLE_DEVICE),
+    "AuthDAO.update_device": lambda auth, _: auth.update_device(
+        SAMPLE_ID, UpdateDeviceData(last_seen=nowutc())
+    ),
+    "UserDAO.get_user_by_id": lambda _, users: users.get_user_by_id(SAMPLE_ID),
+    "UserDAO.get_user_row_by_id": lambda _, users: users.get_user_row_by_id(SAMPLE_ID),
+    "UserDAO.get_login_credentials": lambda _, users: users.get_login_credentials(
+        SAMPLE_ID
+    ),
+    "UserDAO.get_user_by_email": lambda _, users: users.get_user_by_email(SAMPLE_ID),
+    "UserDAO.get_users": lambda _, users: users.get_users(50, (SAMPLE_ID, SAMPLE_ID)),
+    "UserDAO.insert_user": lambda _, users: users.insert_user(SAMPLE_USER),
+    "UserDAO.update_user": lambda _, users: users.update_user(
+        SAMPLE_ID, UserUpdateRequest(first_name=SAMPLE_ID)
+    ),
+    "UserDAO.delete_user": lambda _, users: _delete_user(users),
+}
+
+# NOTE: (statement, parameters, relations read with a Seq Scan)
+StatementPlan = Tuple[str, Any, List[str]]
+
+
+@contextmanager
+def capture_statements(engine: AsyncEngine) -> Iterator[List[Tuple[str, Any]]]:
+    """Record the SQL and the parameters of every statement sent through the engine."""
+    statements: List[Tuple[str, Any]] = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _capture)
+
+
+def find_seq_scans(plan: Any) -> List[str]:
+    """Return the relations read with a Seq Scan in an EXPLAIN (FORMAT JSON) plan."""
+    if isinstance(plan, list):
+        return [relation for node in plan for relation in find_seq_scans(node)]
+
+    if not isinstance(plan, dict):
+        return []
+
+    node = plan.get("Plan", plan)
+    relations = []
+
+    if node.get("Node Type") == "Seq Scan":
+        relations.append(node.get("Relation Name"))
+
+    for child in node.get("Plans", []):
+        relations.extend(find_seq_scans(child))
+
+    return relations
+
+
+def _is_transaction_control(statement: str) -> bool:
+    return statement.lstrip().upper().startswith(("SAVEPOINT", "RELEASE", "ROLLBACK"))
+
+
+async def _explain(
+    connection: AsyncConnection, statement: str, parameters: Any
+) -> List[str]:
+    result = await connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {statement}", parameters
+    )
+    plan = result.scalar_one()
+    return find_seq_scans(json.loads(plan) if isinstance(plan, str) else plan)
+
+
+async def explain_dao_queries(
+    engine: AsyncEngine, queries: Dict[str, DAOQuery] = DAO_QUERIES
+) -> Tuple[Dict[str, List[StatementPlan]], Dict[str, str]]:
+    """Capture the statements of every DAO query and return them with the relations they seq scan, and the failures of the queries that could not be audited."""
+    plans: Dict[str, List[StatementPlan]] = {}
+    failures: Dict[str, str] = {}
+
+    async with engine.connect() as connection:
+        await connection.begin()
+        await connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+
+        for name, query in queries.items():
+            # NOTE: Each query runs in its own savepoint, so a failing one does not abort the audit.
+            session = AuditSession(
+                bind=connection, join_transaction_mode="create_savepoint"
+            )
+
+            with capture_statements(engine) as statements:
+                try:
+                    await query(AuthDAO(session), UserDAO(session, None))
+                except EXPECTED_EXCEPTIONS:
+                    pass
+                except Exception as e:
+                    failures[name] = f"{type(e).__name__}: {e}"
+                finally:
+                    await session.rollback()
+                    await session.close()
+
+            plans[name] = [
+                (
+                    statement,
+                    parameters,
+                    await _explain(connection, statement, parameters),
+                )
+                for statement, parameters in statements
+                if not _is_transaction_control(statement)
+            ]
+
+            if not plans[name] and name not in failures:
+                failures[name] = "no statement captured"
+
+        await connection.rollback()
+
+    return plans, failures
+
+
+async def main():
+    # NOTE: The captured statements are printed below, echo would print them twice.
+    db_engine.echo = False
+
+    try:
+        plans, failures = await explain_dao_queries(db_engine)
+    finally:
+        await db_engine.dispose()
+
+    regressions = len(failures)
+
+    for name, failure in failures.items():
+        print(f"{name}: FAILED {failure}")
+
+    for name, statements in plans.items():
+        for statement, _, seq_scans in statements:
+            status = f"SEQ SCAN on {', '.join(seq_scans)}" if seq_scans else "ok"
+            regressions += bool(seq_scans)
+            print(f"{name}: {status}\n    {' '.join(statement.split())}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+from time import perf_counter
+from typing import Any
+from typing import Dict
+from uuid import uuid4
+
+from server.config import Settings
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.pool import ConnectionPoolEntry
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Async queue pool recording how long checkouts wait for a connection and how close it runs to capacity."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.checkouts = 0
+        self.timeouts = 0
+        self.peak_checked_out = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        # NOTE: The wait includes opening a new connection when the pool grows into its overflow.
+        started_at = perf_counter()
+
+        try:
+            entry = super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+
+        waited = perf_counter() - started_at
+        self.checkouts += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        self.peak_checked_out = max(self.peak_checked_out, self.checkedout())
+        return entry
+
+    def capacity(self) -> int:
+        return self.size() + max(self._max_overflow, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        checked_out = self.checkedout()
+        capacity = self.capacity()
+
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": checked_out,
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "saturation": round(checked_out / capacity, 3) if capacity else 0.0,
+            "peak_checked_out": self.peak_checked_out,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_ms_avg": round(
+                self.wait_seconds_total / self.checkouts * 1000
+                if self.checkouts
+                else 0.0,
+                3,
+            ),
+            "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+        }
+
+
+def connect_args(settings: Settings) -> Dict[str, Any]:
+    """Build the asyncpg connection arguments from the settings."""
+    if settings.DB_PGBOUNCER:
+        # NOTE: With transaction pooling consecutive statements may run on different server connections, so named prepared statements cannot be reused or cached.
+        # Startup parameters are rejected by PgBouncer as well, set jit and statement_timeout on the database role instead.
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+
+    return {
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "server_settings": {
+            "jit": "on" if settings.DB_JIT else "off",
+            "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS),
+        },
+    }
+
+
+def engine_options(settings: Settings) -> Dict[str, Any]:
+    """Build the create_async_engine pool and connection keyword arguments from the settings."""
+    return {
+        "poolclass": InstrumentedPool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": connect_args(settings),
+    }
@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+from server.config import settings as s
+from server.db.pool import InstrumentedPool
+from server.db.pool import connect_args
+from sqlalchemy import exc
+from sqlalchemy.util import greenlet_spawn
+
+
+def _pool(**kwargs) -> InstrumentedPool:
+    return InstrumentedPool(
+        lambda: sqlite3.connect(":memory:", check_same_thread=False), **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_instrumented_pool_records_checkouts_and_saturation():
+    pool = _pool(pool_size=2, max_overflow=2)
+
+    connection = await greenlet_spawn(pool.connect)
+    stats = pool.stats()
+
+    assert stats["checkouts"] == 1
+    assert stats["checked_out"] == 1
+    assert stats["saturation"] == 0.25
+    assert stats["wait_ms_max"] >= stats["wait_ms_avg"] > 0
+
+    await greenlet_spawn(connection.close)
+    assert pool.stats()["checked_out"] == 0
+    assert pool.stats()["peak_checked_out"] == 1
+
+
+@pytest.mark.asyncio
+async def test_instrumented_pool_counts_checkout_timeouts():
+    pool = _pool(pool_size=1, max_overflow=0, timeout=0.01)
+    connection = await greenlet_spawn(pool.connect)
+
+    with pytest.raises(exc.TimeoutError):
+        await greenlet_spawn(pool.connect)
+
+    assert pool.stats()["timeouts"] == 1
+    assert pool.stats()["saturation"] == 1.0
+    await greenlet_spawn(connection.close)
+
+
+def test_connect_args_pgbouncer_mode_disables_prepared_statement_caches():
+    settings = s.model_copy(update={"DB_PGBOUNCER": True})
+
+    args = connect_args(settings)
+
+    assert args["statement_cache_size"] == 0
+    assert args["prepared_statement_cache_size"] == 0
+    assert (
+        args["prepared_statement_name_func"]() != args["prepared_statement_name_func"]()
+    )
+    assert "server_settings" not in args
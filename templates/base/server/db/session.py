@@ -0,0 +1,125 @@
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import List
+
+from server.utils.core.logging.logger import logger
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# NOTE: Bind arguments of the reads that may be served by the replica, e.g. `session.exec(statement, bind_arguments=REPLICA_READ)`.
+REPLICA_READ: Dict[str, Any] = {"replica": True}
+
+# NOTE: Bind arguments of the SELECT statements writing through a data-modifying CTE, which look like reads to the routing.
+PRIMARY_WRITE: Dict[str, Any] = {"write": True}
+
+
+class ReadRouting:
+    """Replica engine of a unit of work, and whether the unit of work has written to the primary."""
+
+    def __init__(self, replica: AsyncEngine | None = None):
+        self.replica = replica
+        self.wrote = False
+
+
+class RoutingSession(Session):
+    """Sync session behind the AsyncSession, choosing the engine of every statement.
+
+    Everything runs on the primary, except the statements executed with the
+    `REPLICA_READ` bind arguments while a replica is configured. Once the unit
+    of work has written, those reads go to the primary as well so the request
+    reads its own writes despite the replication lag. Flushes and DML statements
+    count as writes, as do the statements executed with `PRIMARY_WRITE`.
+    """
+
+    def get_bind(
+        self,
+        mapper=None,
+        *,
+        clause=None,
+        replica: bool = False,
+        write: bool = False,
+        **kw,
+    ):
+        routing: ReadRouting | None = self.info.get("routing")
+
+        if routing is None:
+            return super().get_bind(mapper, clause=clause, **kw)
+
+        if write or self._flushing or getattr(clause, "is_dml", False):
+            routing.wrote = True
+        elif replica and routing.replica is not None and not routing.wrote:
+            return routing.replica.sync_engine
+
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+def routing_session(
+    bind: AsyncEngine, routing: ReadRouting, **kwargs: Any
+) -> AsyncSession:
+    return AsyncSession(
+        bind,
+        sync_session_class=RoutingSession,
+        info={"routing": routing},
+        **kwargs,
+    )
+
+
+class LazySession:
+    """Request-scoped unit of work around an AsyncSession.
+
+    The session is only opened when a DAO first uses it, so requests answered
+    from the cache, or rejected before touching SQL, never build one. DAOs only
+    flush: the request commits once through `complete`, or rolls everything
+    back through `abort`. `release` hands the pooled connection back as soon
+    as a read-only caller is done with it; the proxy transparently re-opens a
+    session on the next use. The replica routing outlives the re-opened sessions.
+    """
+
+    def __init__(self, bind: AsyncEngine, replica: AsyncEngine | None = None):
+        self._bind = bind
+        self._routing = ReadRouting(replica)
+        self._session: AsyncSession | None = None
+        self._after_commit: List[Callable[[], Awaitable[None]]] = []
+
+    @property
+    def is_active(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._session is None:
+            self._session = routing_session(
+                self._bind, self._routing, expire_on_commit=False
+            )
+        return getattr(self._session, name)
+
+    def after_commit(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """Register a side effect that must only happen once the unit of work is committed."""
+        self._after_commit.append(callback)
+
+    async def complete(self) -> None:
+        if self._session is not None and self._session.in_transaction():
+            await self._session.commit()
+
+        # NOTE: The unit of work is committed already, a failing side effect is logged and never fails the request.
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                logger.error(
+                    f"After commit callback {getattr(callback, '__qualname__', callback)} failed: {e}"
+                )
+
+    async def abort(self) -> None:
+        self._after_commit.clear()
+
+        if self._session is not None:
+            await self._session.rollback()
+
+    async def release(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,156 @@
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import pytest
+from server.db.session import PRIMARY_WRITE
+from server.db.session import REPLICA_READ
+from server.db.session import LazySession
+from server.db.session import ReadRouting
+from server.db.session import RoutingSession
+from sqlalchemy import Column
+from sqlalchemy import Integer
+from sqlalchemy import MetaData
+from sqlalchemy import String
+from sqlalchemy import Table
+from sqlalchemy import create_engine
+from sqlmodel import insert
+from sqlmodel import select
+
+
+def test_lazy_session_is_only_opened_on_first_use():
+    lazy_session = LazySession(MagicMock())
+
+    assert not lazy_session.is_active
+
+    assert not lazy_session.in_transaction()
+    assert lazy_session.is_active
+
+
+@pytest.mark.asyncio
+async def test_lazy_session_release():
+    lazy_session = LazySession(MagicMock())
+    lazy_session._session = AsyncMock()
+    session = lazy_session._session
+
+    await lazy_session.release()
+
+    session.close.assert_awaited_once()
+    assert not lazy_session.is_active
+
+    # Releasing an unused session is a no-op
+    await lazy_session.release()
+
+
+@pytest.mark.asyncio
+async def test_lazy_session_complete_commits_once_then_runs_callbacks():
+    lazy_session = LazySession(MagicMock())
+    lazy_session._session = AsyncMock()
+    lazy_session._session.in_transaction = MagicMock(return_value=True)
+    callback = AsyncMock()
+
+    lazy_session.after_commit(callback)
+    await lazy_session.complete()
+
+    lazy_session._session.commit.assert_awaited_once()
+    callback.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_lazy_session_complete_runs_every_callback_when_one_fails():
+    lazy_session = LazySession(MagicMock())
+    failing = AsyncMock(side_effect=ConnectionError("cache unreachable"))
+    callback = AsyncMock()
+
+    lazy_session.after_commit(failing)
+    lazy_session.after_commit(callback)
+    await lazy_session.complete()
+
+    failing.assert_awaited_once()
+    callback.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_lazy_session_abort_rolls_back_and_drops_callbacks():
+    lazy_session = LazySession(MagicMock())
+    lazy_session._session = AsyncMock()
+    lazy_session._session.in_transaction = MagicMock(return_value=False)
+    callback = AsyncMock()
+
+    lazy_session.after_commit(callback)
+    await lazy_session.abort()
+    await lazy_session.complete()
+
+    lazy_session._session.rollback.assert_awaited_once()
+    callback.assert_not_awaited()
+
+
+# NOTE: Replica routing is exercised on two sync SQLite engines standing in for the primary and the replica.
+
+
+routed_rows = Table(
+    "routed_rows",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("origin", String),
+)
+
+
+@pytest.fixture
+def engines():
+    primary = create_engine("sqlite://")
+    replica = create_engine("sqlite://")
+
+    for engine, origin in ((primary, "primary"), (replica, "replica")):
+        routed_rows.create(engine)
+        with engine.begin() as connection:
+            connection.execute(routed_rows.insert(), {"id": 1, "origin": origin})
+
+    return primary, replica
+
+
+def _routing_session(primary, replica) -> RoutingSession:
+    # NOTE: The routing only needs the sync engine behind the replica AsyncEngine.
+    return RoutingSession(
+        bind=primary, info={"routing": ReadRouting(MagicMock(sync_engine=replica))}
+    )
+
+
+def _origins(session: RoutingSession, **kwargs):
+    return session.exec(
+        select(routed_rows.c.origin).order_by(routed_rows.c.id), **kwargs
+    ).all()
+
+
+def test_routing_session_sends_replica_reads_to_the_replica(engines):
+    session = _routing_session(*engines)
+
+    assert _origins(session, bind_arguments=REPLICA_READ) == ["replica"]
+    assert _origins(session) == ["primary"]
+
+
+def test_routing_session_reads_its_own_writes_from_the_primary(engines):
+    session = _routing_session(*engines)
+
+    session.exec(insert(routed_rows).values(id=2, origin="primary"))
+
+    assert _origins(session, bind_arguments=REPLICA_READ) == ["primary", "primary"]
+
+    # A new session of the same unit of work stays on the primary
+    routing = session.info["routing"]
+    session.commit()
+    session = RoutingSession(bind=engines[0], info={"routing": routing})
+    assert _origins(session, bind_arguments=REPLICA_READ) == ["primary", "primary"]
+
+
+def test_routing_session_counts_primary_writes_as_writes(engines):
+    session = _routing_session(*engines)
+
+    # A SELECT writing through a data-modifying CTE looks like a read
+    assert _origins(session, bind_arguments=PRIMARY_WRITE) == ["primary"]
+    assert _origins(session, bind_arguments=REPLICA_READ) == ["primary"]
+
+
+def test_routing_session_without_replica_uses_the_primary(engines):
+    session = RoutingSession(bind=engines[0], info={"routing": ReadRouting()})
+
+    assert _origins(session, bind_arguments=REPLICA_READ) == ["primary"]
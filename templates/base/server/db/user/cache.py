@@ -0,0 +1,131 @@
+import struct
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from typing import Any
+from typing import Mapping
+
+from redis import asyncio as aioredis
+from server.db.user.schema import UserRole
+
+# NOTE: Bumped whenever the layout changes, entries of another version are read as misses and refilled.
+CACHE_FORMAT_VERSION = 1
+
+# NOTE: version, role, verified, created_at, updated_at, then the byte lengths of id, first_name, last_name and email.
+_HEADER = struct.Struct("!BBqqqHHHH")
+_NO_TIMESTAMP = -(2**63)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+# NOTE: Roles are stored by position, new roles must be appended to UserRole.
+_ROLES = tuple(UserRole)
+
+
+@dataclass(frozen=True, slots=True)
+class CachedUser:
+    """Public columns of a user, as cached to authenticate requests. The password hash is never cached."""
+
+    id: str
+    first_name: str
+    last_name: str
+    email: str
+    role: UserRole
+    verified: datetime | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any]) -> "CachedUser":
+        return cls(
+            id=row["id"],
+            first_name=row["first_name"],
+            last_name=row["last_name"],
+            email=row["email"],
+            role=UserRole(row["role"]),
+            verified=row["verified"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+        )
+
+
+def encode_user(user: CachedUser) -> bytes:
+    strings = [
+        value.encode()
+        for value in (user.id, user.first_name, user.last_name, user.email)
+    ]
+    header = _HEADER.pack(
+        CACHE_FORMAT_VERSION,
+        _ROLES.index(user.role),
+        _to_timestamp(user.verified),
+        _to_timestamp(user.created_at),
+        _to_timestamp(user.updated_at),
+        *(len(value) for value in strings),
+    )
+    return b"".join((header, *strings))
+
+
+def decode_user(data: bytes) -> CachedUser | None:
+    """Decode a cached user without any validation. Returns None for an entry of another format version."""
+    if len(data) < _HEADER.size or data[0] != CACHE_FORMAT_VERSION:
+        return None
+
+    _, role, verified, created_at, updated_at, *lengths = _HEADER.unpack_from(data)
+
+    strings = []
+    offset = _HEADER.size
+    for length in lengths:
+        strings.append(data[offset : offset + length].decode())
+        offset += length
+
+    return CachedUser(
+        *strings,
+        role=_ROLES[role],
+        verified=_from_timestamp(verified),
+        created_at=_from_timestamp(created_at),
+        updated_at=_from_timestamp(updated_at),
+    )
+
+
+def _to_timestamp(value: datetime | None) -> int:
+    if value is None:
+        return _NO_TIMESTAMP
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def _from_timestamp(value: int) -> datetime | None:
+    if value == _NO_TIMESTAMP:
+        return None
+    return _EPOCH + value * _MICROSECOND
+
+
+# NOTE: Per-user version of the stateless access tokens. It is the time of the last bump in milliseconds, so a key
+# expiring together with the tokens it revoked never lets an older token through again.
+
+_BUMP_USER_VERSION = """
+local version = math.max(tonumber(redis.call('GET', KEYS[1]) or 0) + 1, tonumber(ARGV[1]))
+redis.call('SET', KEYS[1], version, 'EX', ARGV[2])
+return version
+"""
+
+
+def user_version_key(user_id: str) -> str:
+    return f"user_version:{user_id}"
+
+
+async def get_user_version(cache: aioredis.Redis, user_id: str) -> int:
+    version = await cache.get(user_version_key(user_id))
+    return int(version) if version else 0
+
+
+async def bump_user_version(cache: aioredis.Redis, user_id: str, ttl: int) -> int:
+    """Revoke the stateless access tokens issued so far. The version never goes backwards, whatever the worker clocks."""
+    return await cache.eval(
+        _BUMP_USER_VERSION,
+        1,
+        user_version_key(user_id),
+        int(datetime.now(timezone.utc).timestamp() * 1000),
+        ttl,
+    )
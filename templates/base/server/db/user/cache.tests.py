@@ -0,0 +1,40 @@
+from datetime import timezone
+
+from server.db.user.cache import CachedUser
+from server.db.user.cache import decode_user
+from server.db.user.cache import encode_user
+from server.db.user.schema import UserRole
+from server.utils import nowutc
+
+
+def test_cached_user_round_trip():
+    user = CachedUser(
+        id="ck0000000000000000000001",
+        first_name="Jöhn",
+        last_name="Doe",
+        email="john.doe@example.com",
+        role=UserRole.ADMIN,
+        verified=nowutc(),
+        created_at=nowutc(),
+    )
+
+    decoded = decode_user(encode_user(user))
+
+    assert decoded == user
+    assert decoded.updated_at is None
+    assert decoded.verified.tzinfo == timezone.utc
+
+
+def test_cached_user_from_row_leaves_the_password_out(mock_current_user_with_id):
+    user = mock_current_user_with_id()
+
+    cached_user = CachedUser.from_row(user.model_dump())
+
+    assert not hasattr(cached_user, "password")
+    assert b"hashed_password" not in encode_user(cached_user)
+
+
+def test_decode_user_ignores_other_format_versions():
+    # A JSON entry written before the binary encoding is read as a miss
+    assert decode_user(b'{"id": "123"}') is None
+    assert decode_user(b"") is None
@@ -1,16 +1,60 @@
+from typing import AsyncIterator
 from typing import Sequence
+from typing import Tuple
 
 from redis import asyncio as aioredis
+from server.config import settings as s
+from server.db import open_session
+from server.db.cache import publish_invalidation
+from server.db.session import REPLICA_READ
+from server.db.session import LazySession
+from server.db.user.cache import bump_user_version
+from server.db.user.cache import user_version_key
 from server.db.user.schema import User
 from server.exceptions.user import UserNotFoundException
+from server.exceptions.user import UserWithEmailAlreadyExistsException
 from server.models import UserCreateRequest
 from server.models import UserUpdateRequest
+from server.utils import cuid
+from server.utils.core.logging.logger import logger
+from sqlalchemy import Row
+from sqlalchemy import RowMapping
+from sqlalchemy import select as core_select
+from sqlalchemy.dialects.postgresql import insert
 from sqlmodel import select
-from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import tuple_
+from sqlmodel import update
+
+# NOTE: Plain columns are streamed for exports, building ORM objects per row would dominate the cost.
+USER_EXPORT_COLUMNS = (
+    User.id,
+    User.first_name,
+    User.last_name,
+    User.email,
+    User.role,
+    User.verified,
+    User.created_at,
+)
+
+# NOTE: Hot reads select plain columns through Core and return Rows, skipping ORM entity loading and the identity map.
+users_table = User.__table__
+
+LOGIN_COLUMNS = (
+    users_table.c.id,
+    users_table.c.first_name,
+    users_table.c.last_name,
+    users_table.c.email,
+    users_table.c.password,
+    users_table.c.role,
+    users_table.c.verified,
+)
+
+# NOTE: Updating any of these revokes the stateless access tokens of the user, they carry role and verified as claims.
+TOKEN_REVOKING_FIELDS = frozenset({"role", "verified", "password"})
 
 
 class UserDAO:
-    def __init__(self, session: AsyncSession, cache: aioredis.Redis):
+    def __init__(self, session: LazySession, cache: aioredis.Redis):
         self._session = session
         self._cache = cache
 
@@ -19,33 +63,94 @@ class UserDAO:
         user = result.first()
         return user
 
-    async def get_users(self) -> Sequence[User]:
-        users = await self._session.exec(select(User).order_by(User.last_name))
+    async def get_user_row_by_id(self, user_id: str) -> Row | None:
+        """Get every column of a user as a Row, without building an ORM entity."""
+        # NOTE: Kept on the primary, the row refills the cache right after an invalidation and a lagging replica would cache the old one again.
+        connection = await self._session.connection()
+        result = await connection.execute(
+            core_select(users_table).where(users_table.c.id == user_id)
+        )
+        return result.first()
+
+    async def get_login_credentials(self, email: str) -> Row | None:
+        """Get the columns a login needs as a Row. Takes the user's email as an argument."""
+        connection = await self._session.connection()
+        result = await connection.execute(
+            core_select(*LOGIN_COLUMNS).where(users_table.c.email == email)
+        )
+        return result.first()
+
+    async def get_users(
+        self, limit: int, after: Tuple[str, str] | None = None
+    ) -> Sequence[User]:
+        """Get up to limit users ordered by (last_name, id), starting after the given key."""
+        statement = select(User).order_by(User.last_name, User.id).limit(limit)
+
+        # NOTE: A row value comparison is served by the (last_name, id) index at any depth, unlike an OFFSET.
+        if after:
+            statement = statement.where(
+                tuple_(User.last_name, User.id) > tuple_(*after)
+            )
+
+        users = await self._session.exec(statement, bind_arguments=REPLICA_READ)
         return users.all()
 
+    async def stream_users(
+        self, batch_size: int
+    ) -> AsyncIterator[Sequence[RowMapping]]:
+        """Stream the exported user columns from a server-side cursor, batch_size rows at a time."""
+        statement = (
+            select(*USER_EXPORT_COLUMNS)
+            .order_by(User.last_name, User.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+        # NOTE: The rows are consumed while the response is sent, after the request session is closed.
+        async with open_session() as session:
+            result = await session.stream(statement, bind_arguments=REPLICA_READ)
+
+            async for rows in result.mappings().partitions():
+                yield rows
+
     async def get_user_by_email(self, email: str) -> User | None:
         result = await self._session.exec(select(User).where(User.email == email))
         user = result.first()
         return user
 
     async def insert_user(self, user_data: UserCreateRequest) -> User:
-        user = User(**user_data.model_dump())
-        self._session.add(user)
-        await self._session.commit()
+        """Insert the user in one round trip. The unique email index settles concurrent signups."""
+        result = await self._session.exec(
+            insert(User)
+            .values(id=cuid(), **user_data.model_dump(exclude_none=True))
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(User)
+        )
+        user = result.scalar_one_or_none()
+
+        if not user:
+            raise UserWithEmailAlreadyExistsException()
+
         return user
 
     async def update_user(self, user_id: str, user_data: UserUpdateRequest) -> User:
-        user = await self.get_user_by_id(user_id)
-        if not user:
-            raise UserNotFoundException()
+        """Update the provided fields in a single UPDATE ... RETURNING round trip."""
+        values = user_data.model_dump(exclude_none=True)
 
-        for key, value in user_data.model_dump(exclude_none=True).items():
-            setattr(user, key, value)
+        if not values:
+            user = await self.get_user_by_id(user_id)
+        else:
+            result = await self._session.exec(
+                update(User).where(User.id == user_id).values(**values).returning(User)
+            )
+            user = result.scalar_one_or_none()
 
-        self._session.add(user)
-        await self._session.commit()
+        if not user:
+            raise UserNotFoundException()
 
-        await self._cache.delete(f"user_id:{user_id}")
+        # NOTE: Evicted rather than refreshed, two concurrent updates could otherwise cache their rows out of commit order.
+        self._invalidate_cached_user(
+            user_id, revoke_tokens=not TOKEN_REVOKING_FIELDS.isdisjoint(values)
+        )
         return user
 
     async def delete_user(self, user_id: str) -> None:
@@ -55,4 +160,33 @@ class UserDAO:
             raise UserNotFoundException()
 
         await self._session.delete(user)
-        await self._session.commit()
+        await self._session.flush()
+
+        self._invalidate_cached_user(user_id, revoke_tokens=True)
+
+    def _invalidate_cached_user(
+        self, user_id: str, revoke_tokens: bool = False
+    ) -> None:
+        cache_key = f"user_id:{user_id}"
+
+        # NOTE: Evicting before the commit would let a concurrent request cache the old row again.
+        async def _invalidate():
+            # NOTE: The revocation goes first and is guarded on its own, a failed eviction must not keep old tokens valid.
+            if revoke_tokens:
+                try:
+                    await bump_user_version(
+                        self._cache, user_id, s.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+                    )
+                except aioredis.RedisError as e:
+                    logger.error(
+                        f"Could not revoke the access tokens of {user_id}: {e}"
+                    )
+                await publish_invalidation(self._cache, user_version_key(user_id))
+
+            try:
+                await self._cache.delete(cache_key)
+            except aioredis.RedisError as e:
+                logger.error(f"Could not evict cached user {user_id}: {e}")
+            await publish_invalidation(self._cache, cache_key)
+
+        self._session.after_commit(_invalidate)
@@ -0,0 +1,28 @@
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import pytest
+from redis import asyncio as aioredis
+from server.db.user.dao import UserDAO
+
+
+@pytest.mark.asyncio
+async def test_invalidate_cached_user_revokes_tokens_when_the_eviction_fails():
+    session = MagicMock()
+    cache = AsyncMock()
+    cache.delete.side_effect = aioredis.ConnectionError("cache unreachable")
+    cache.eval.return_value = 1
+
+    UserDAO(session, cache)._invalidate_cached_user("123", revoke_tokens=True)
+    (invalidate,) = session.after_commit.call_args.args
+    await invalidate()
+
+    # The version is bumped before the eviction is even attempted
+    assert [call[0] for call in cache.method_calls[:2]] == ["eval", "publish"]
+    cache.delete.assert_awaited_once_with("user_id:123")
+
+    # Both keys are still published to the other workers
+    assert [call.args[1] for call in cache.publish.await_args_list] == [
+        "user_version:123",
+        "user_id:123",
+    ]
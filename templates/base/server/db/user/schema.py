@@ -7,6 +7,7 @@ from server.utils import cuid
 from server.utils import nowutc
 from sqlmodel import Column
 from sqlmodel import Field
+from sqlmodel import Index
 from sqlmodel import SQLModel
 
 
@@ -17,6 +18,7 @@ class UserRole(str, Enum):
 
 class User(SQLModel, table=True):
     __tablename__ = "users"
+    __table_args__ = (Index("ix_users_last_name_id", "last_name", "id"),)
     id: str = Field(
         default_factory=cuid,
         sa_column=Column(
@@ -42,6 +42,10 @@ class DeviceNotCreatedException(ServerException):
     """Raised when the device creation fails."""
 
 
+class PasswordHasherBusyException(ServerException):
+    """Raised when the password hashing queue is saturated."""
+
+
 AUTH_EXCEPTIONS = {
     InvalidCredentialsException: {
         "status_code": status.HTTP_401_UNAUTHORIZED,
@@ -114,4 +118,12 @@ AUTH_EXCEPTIONS = {
             "error_code": "device_creation_failed",
         },
     },
+    PasswordHasherBusyException: {
+        "status_code": status.HTTP_503_SERVICE_UNAVAILABLE,
+        "detail": {
+            "message": "The server is busy, please try again in a moment",
+            "error_code": "password_hasher_busy",
+        },
+        "headers": {"Retry-After": "1"},
+    },
 }
@@ -26,6 +26,10 @@ class UserNotLoggedInException(ServerException):
     pass
 
 
+class InvalidCursorException(ServerException):
+    pass
+
+
 USER_EXCEPTIONS = {
     UserNotFoundException: {
         "status_code": status.HTTP_404_NOT_FOUND,
@@ -69,4 +73,11 @@ USER_EXCEPTIONS = {
             "error_code": "user_not_logged_in",
         },
     },
+    InvalidCursorException: {
+        "status_code": status.HTTP_400_BAD_REQUEST,
+        "detail": {
+            "message": "The provided pagination cursor is invalid",
+            "error_code": "invalid_cursor",
+        },
+    },
 }
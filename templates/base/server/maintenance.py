@@ -0,0 +1,172 @@
+"""Periodic database maintenance.
+
+Started from the app lifespan, or run a single pass from the project root:
+
+    python -m server.maintenance
+"""
+
+import asyncio
+from datetime import datetime
+from time import perf_counter
+from typing import Any
+from typing import Dict
+from typing import Type
+
+from server.config import settings as s
+from server.db import db_engine
+from server.db.auth.schema import RefreshToken
+from server.db.auth.schema import ValidationToken
+from server.utils import nowutc
+from server.utils.core.logging.logger import logger
+from server.utils.core.metrics import register_metrics
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import SQLModel
+from sqlmodel import delete
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# NOTE: Tables swept for expired rows, with the unique column used to address a batch.
+EXPIRING_TABLES = (
+    (RefreshToken, "jti"),
+    (ValidationToken, "token"),
+)
+
+
+def expired_batch_statement(
+    model: Type[SQLModel], key: str, now: datetime, batch_size: int
+):
+    """Delete at most batch_size expired rows. Rows locked by a request are skipped and picked up by a later pass."""
+    key_column = getattr(model, key)
+    expired = (
+        select(key_column)
+        .where(model.expires_at < now)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    return delete(model).where(key_column.in_(expired.scalar_subquery()))
+
+
+class TokenSweeper:
+    """Deletes expired refresh and validation tokens in bounded batches, each in its own short transaction."""
+
+    def __init__(self, engine: AsyncEngine, batch_size: int, interval: int):
+        self._engine = engine
+        self._batch_size = batch_size
+        self._interval = interval
+
+        self.runs = 0
+        self.failures = 0
+        self.purged: Dict[str, int] = {
+            model.__tablename__: 0 for model, _ in EXPIRING_TABLES
+        }
+        self.last_duration = 0.0
+        self.total_duration = 0.0
+
+    async def sweep(self) -> Dict[str, int]:
+        """Run one pass over every expiring table. Returns the number of rows purged per table."""
+        started_at = perf_counter()
+        now = nowutc()
+        purged = {}
+
+        for model, key in EXPIRING_TABLES:
+            purged[model.__tablename__] = await self._sweep_table(model, key, now)
+
+        self.runs += 1
+        self.last_duration = perf_counter() - started_at
+        self.total_duration += self.last_duration
+
+        return purged
+
+    async def run(self) -> None:
+        while True:
+            try:
+                purged = await self.sweep()
+                logger.info(f"Expired tokens purged: {purged}")
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Token sweep failed: {e}")
+
+            await asyncio.sleep(self._interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "purged": dict(self.purged),
+            "last_duration_ms": round(self.last_duration * 1000, 3),
+            "total_duration_ms": round(self.total_duration * 1000, 3),
+        }
+
+    async def _sweep_table(self, model: Type[SQLModel], key: str, now: datetime) -> int:
+        total = 0
+
+        while True:
+            deleted = await self._delete_batch(model, key, now)
+            total += deleted
+            self.purged[model.__tablename__] += deleted
+
+            if deleted < self._batch_size:
+                return total
+
+            # NOTE: Give request handlers a turn between batches.
+            await asyncio.sleep(0)
+
+    async def _delete_batch(
+        self, model: Type[SQLModel], key: str, now: datetime
+    ) -> int:
+        async with AsyncSession(self._engine) as session:
+            result = await session.exec(
+                expired_batch_statement(model, key, now, self._batch_size)
+            )
+            await session.commit()
+            return result.rowcount
+
+
+# NOTE: One sweeper task per worker, concurrent sweepers skip each other's locked rows:
+
+token_sweeper: TokenSweeper | None = None
+_sweeper_task: asyncio.Task | None = None
+
+
+def init_token_sweeper() -> TokenSweeper:
+    global token_sweeper
+    token_sweeper = TokenSweeper(
+        db_engine,
+        batch_size=s.TOKEN_SWEEPER_BATCH_SIZE,
+        interval=s.TOKEN_SWEEPER_INTERVAL_SECONDS,
+    )
+    register_metrics("token_sweeper", token_sweeper.stats)
+    return token_sweeper
+
+
+def start_token_sweeper() -> None:
+    global _sweeper_task
+
+    if s.TOKEN_SWEEPER_INTERVAL_SECONDS <= 0:
+        return
+
+    _sweeper_task = asyncio.create_task(init_token_sweeper().run())
+
+
+async def stop_token_sweeper() -> None:
+    global _sweeper_task
+
+    if _sweeper_task:
+        _sweeper_task.cancel()
+        try:
+            await _sweeper_task
+        except asyncio.CancelledError:
+            pass
+        _sweeper_task = None
+
+
+async def main():
+    try:
+        purged = await init_token_sweeper().sweep()
+        print(f"Expired tokens purged: {purged} in {token_sweeper.last_duration:.3f}s")
+    finally:
+        await db_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from server.db.auth.schema import RefreshToken
+from server.maintenance import TokenSweeper
+from server.maintenance import expired_batch_statement
+from server.utils import nowutc
+from sqlalchemy.dialects import postgresql
+
+
+def test_expired_batch_statement_is_bounded_and_skips_locked_rows():
+    statement = expired_batch_statement(RefreshToken, "jti", nowutc(), 500)
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    assert sql.startswith("DELETE FROM refresh_tokens")
+    assert "refresh_tokens.expires_at <" in sql
+    assert "LIMIT" in sql
+    assert "FOR UPDATE SKIP LOCKED" in sql
+
+
+@pytest.mark.asyncio
+async def test_sweep_deletes_batches_until_a_partial_one():
+    sweeper = TokenSweeper(AsyncMock(), batch_size=100, interval=60)
+    sweeper._delete_batch = AsyncMock(side_effect=[100, 100, 30, 0])
+
+    purged = await sweeper.sweep()
+
+    assert purged == {"refresh_tokens": 230, "validation_tokens": 0}
+    assert sweeper._delete_batch.await_count == 4
+    assert sweeper.stats()["runs"] == 1
+    assert sweeper.stats()["purged"] == purged
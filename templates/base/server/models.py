@@ -1,4 +1,5 @@
 from datetime import datetime
+from enum import Enum
 from typing import List
 from typing import Optional
 
@@ -43,6 +44,16 @@ class UserResponse(UserBase):
     verified: Optional[datetime] = None
 
 
+class UserPageResponse(BaseModel):
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
 class UserCreateResponse(BaseModel):
     message: str = (
         "Account successfully created! Please check your email to verify your account."
@@ -59,6 +70,9 @@ class TokenBase(BaseModel):
 
 class AccessTokenData(TokenBase):
     id: str
+    role: Optional[UserRole] = None
+    verified: Optional[bool] = None
+    version: Optional[int] = None
 
 
 class RefreshTokenData(TokenBase):
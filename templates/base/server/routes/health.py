@@ -1,5 +1,6 @@
 from datetime import datetime
 from enum import Enum
+from typing import Any
 from typing import Dict
 
 import psutil
@@ -10,6 +11,7 @@ from server.db import check_cache
 from server.db import check_database
 from server.utils import nowutc
 from server.utils.core.logging.logger import logger
+from server.utils.core.metrics import collect_metrics
 
 
 class ServiceStatus(str, Enum):
@@ -78,3 +80,9 @@ async def health_check() -> Dict:
         "database": db_status,
         "cache": cache_status,
     }
+
+
+@router.get("/metrics")
+async def metrics() -> Dict[str, Dict[str, Any]]:
+    """Metrics endpoint. Returns the counters exported by the server components."""
+    return collect_metrics()
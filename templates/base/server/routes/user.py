@@ -1,39 +1,69 @@
-from typing import List
-
 from fastapi import APIRouter
 from fastapi import Depends
+from fastapi import Query
 from fastapi import status
-from server.db.user.schema import User
+from fastapi.responses import StreamingResponse
+from server.config import settings as s
+from server.db.user.cache import CachedUser
 from server.exceptions.user import UserNotFoundException
+from server.models import ExportFormat
+from server.models import UserPageResponse
 from server.models import UserResponse
 from server.models import UserUpdateRequest
 from server.services.auth.dependencies import get_current_active_user
+from server.services.auth.dependencies import get_current_user_profile
 from server.services.user import get_user_service
 from server.services.user.service import UserService
+from server.utils.security.principal import Principal
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[UserResponse])
+@router.get("/", response_model=UserPageResponse)
 async def get_users(
+    cursor: str | None = None,
+    limit: int = Query(default=s.DEFAULT_PAGE_SIZE, ge=1, le=s.MAX_PAGE_SIZE),
     user_service: UserService = Depends(get_user_service),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
 ):
-    """Get all users. Returns a list of users."""
-    return await user_service.get_users(current_user)
+    """Get a page of users ordered by last name. Pass the returned next_cursor to get the following page."""
+    users, next_cursor = await user_service.get_users(current_user, cursor, limit)
+    return {"items": users, "next_cursor": next_cursor}
 
 
 @router.get("/me", response_model=UserResponse, status_code=status.HTTP_200_OK)
-async def get_current_user(current_user: User = Depends(get_current_active_user)):
+async def get_current_user(
+    current_user: CachedUser = Depends(get_current_user_profile),
+):
     """Get the current user. Returns the user associated to the current session."""
     return current_user
 
 
+@router.get("/export", response_class=StreamingResponse)
+async def export_users(
+    export_format: ExportFormat = Query(default=ExportFormat.NDJSON, alias="format"),
+    user_service: UserService = Depends(get_user_service),
+    current_user: Principal = Depends(get_current_active_user),
+):
+    """Export every user as NDJSON or CSV. The rows are streamed as they are read."""
+    media_type = (
+        "text/csv" if export_format == ExportFormat.CSV else "application/x-ndjson"
+    )
+
+    return StreamingResponse(
+        user_service.export_users(current_user, export_format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="users.{export_format.value}"'
+        },
+    )
+
+
 @router.get("/{userd_id}", response_model=UserResponse, status_code=status.HTTP_200_OK)
 async def get_user(
     userd_id: str,
     user_service: UserService = Depends(get_user_service),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
 ):
     """Get a user by id. Returns the user associated to the provided id."""
     user = await user_service.get_user(userd_id, current_user)
@@ -49,7 +79,7 @@ async def update_user(
     userd_id: str,
     user_data: UserUpdateRequest,
     user_service: UserService = Depends(get_user_service),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
 ):
     """Update a user by id. Returns the updated user."""
     return await user_service.update_user(userd_id, user_data, current_user)
@@ -59,7 +89,7 @@ async def update_user(
 async def delete_user(
     userd_id: str,
     user_service: UserService = Depends(get_user_service),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
 ):
     """Delete a user by id."""
     await user_service.delete_user(userd_id, current_user)
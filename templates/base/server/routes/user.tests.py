@@ -7,8 +7,10 @@ from server.config import settings as s
 from server.db.user.schema import User
 from server.db.user.schema import UserRole
 from server.exceptions.user import UserRoleNotAllowedException
+from server.models import ExportFormat
 from server.models import UserResponse
 from server.services.auth.dependencies import get_current_active_user
+from server.services.auth.dependencies import get_current_user_profile
 from server.services.user import get_user_service
 
 
@@ -46,9 +48,10 @@ async def test_get_users_as_admin(
                 role=UserRole.USER,
             ),
         ]
-        mock_user_service.get_users.return_value = [
-            User(**user.model_dump()) for user in users
-        ]
+        mock_user_service.get_users.return_value = (
+            [User(**user.model_dump()) for user in users],
+            "next_page",
+        )
 
         # Call the endpoint with the mocked token
         headers = {"Authorization": f"Bearer {mock_access_token}"}
@@ -56,8 +59,13 @@ async def test_get_users_as_admin(
 
         # Assert response
         assert response.status_code == 200
-        assert response.json() == [user.model_dump() for user in users]
-        mock_user_service.get_users.assert_called_once_with(admin_user_override)
+        assert response.json() == {
+            "items": [user.model_dump() for user in users],
+            "next_cursor": "next_page",
+        }
+        mock_user_service.get_users.assert_called_once_with(
+            admin_user_override, None, s.DEFAULT_PAGE_SIZE
+        )
     finally:
         app.dependency_overrides.clear()
 
@@ -78,7 +86,7 @@ async def test_get_users(
     mock_user_access_token = mock_access_token(role=current_user_instance.role)
 
     # Configure the mock service
-    async def mock_get_users(current_user):
+    async def mock_get_users(current_user, cursor, limit):
         raise UserRoleNotAllowedException()
 
     mock_user_service.get_users = AsyncMock(side_effect=mock_get_users)
@@ -95,7 +103,9 @@ async def test_get_users(
         )
         assert response_json["error_code"] == "user_role_not_allowed"
 
-        mock_user_service.get_users.assert_called_once_with(current_user_instance)
+        mock_user_service.get_users.assert_called_once_with(
+            current_user_instance, None, s.DEFAULT_PAGE_SIZE
+        )
 
     finally:
         app.dependency_overrides.clear()
@@ -108,8 +118,8 @@ async def test_get_current_user(app, test_client, mock_current_user, mock_access
         current_user_instance = mock_current_user(
             email="user@example.com", role=UserRole.USER
         )
-        app.dependency_overrides[get_current_active_user] = (
-            lambda: current_user_instance
+        app.dependency_overrides[get_current_user_profile] = lambda: (
+            current_user_instance
         )
 
         # Call the endpoint
@@ -175,8 +185,8 @@ async def test_update_user(
         current_user_instance = mock_current_user(
             email="admin@example.com", role=UserRole.ADMIN
         )
-        app.dependency_overrides[get_current_active_user] = (
-            lambda: current_user_instance
+        app.dependency_overrides[get_current_active_user] = lambda: (
+            current_user_instance
         )
 
         # Mock the UserService's `update_user` method
@@ -223,3 +233,32 @@ async def test_delete_user(
         mock_user_service.delete_user.assert_called_once_with("123", current_user)
     finally:
         app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_export_users_as_admin(
+    app, test_client, mock_user_service, admin_user_override, mock_access_token
+):
+    try:
+        app.dependency_overrides[get_current_active_user] = lambda: admin_user_override
+        app.dependency_overrides[get_user_service] = lambda: mock_user_service
+
+        async def export():
+            yield "id,email\r\n"
+            yield "1,john.doe@example.com\r\n"
+
+        mock_user_service.export_users.return_value = export()
+
+        headers = {"Authorization": f"Bearer {mock_access_token}"}
+        response = test_client.get(
+            f"{s.API_PREFIX}/users/export?format=csv", headers=headers
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert response.text == "id,email\r\n1,john.doe@example.com\r\n"
+        mock_user_service.export_users.assert_called_once_with(
+            admin_user_override, ExportFormat.CSV
+        )
+    finally:
+        app.dependency_overrides.clear()
@@ -1,67 +1,157 @@
-import orjson as json
 from fastapi import Depends
 from fastapi.security import HTTPBearer
 from jose import JWTError
 from redis import asyncio as aioredis
 from server.config import settings as s
-from server.db import get_cache
-from server.db import get_session
+from server.db import get_local_cache
+from server.db import get_raw_cache
+from server.db import get_user_flights
+from server.db import open_session
+from server.db.cache import LocalCache
+from server.db.cache import SingleFlight
+from server.db.cache import jittered_ttl
+from server.db.user.cache import CachedUser
+from server.db.user.cache import decode_user
+from server.db.user.cache import encode_user
+from server.db.user.cache import get_user_version
+from server.db.user.cache import user_version_key
 from server.db.user.dao import UserDAO
-from server.db.user.schema import User
 from server.exceptions.auth import EmailNotVerifiedException
 from server.exceptions.auth import InvalidCredentialsException
 from server.services.auth import get_token_manager
+from server.utils.security.principal import Principal
 from server.utils.security.tokens import TokenManager
-from sqlmodel.ext.asyncio.session import AsyncSession
 
 auth_scheme = HTTPBearer()
 
-# NOTE: This function is used to get the current user from the JWT token. It takes the token as an argument and returns the user's data.
+
+async def _load_cached_user(
+    user_id: str,
+    cache: aioredis.Redis,
+    user_flights: SingleFlight,
+) -> CachedUser:
+    """Get the cached user from Redis, refilling the entry from the database on a miss."""
+    cache_key = f"user_id:{user_id}"
+
+    async def read_cached_user() -> CachedUser | None:
+        try:
+            cached_user = await cache.get(cache_key)
+        except aioredis.RedisError:
+            return None
+
+        return decode_user(cached_user) if cached_user else None
+
+    async def fill_cached_user() -> CachedUser:
+        # NOTE: The fill is shared by every concurrent miss and may outlive the request that started it, it reads
+        # through its own short-lived session rather than that request's unit of work.
+        async with open_session() as session:
+            user_row = await UserDAO(session, cache).get_user_row_by_id(user_id)
+
+        if not user_row:
+            raise InvalidCredentialsException()
+
+        # NOTE: Built straight from the row, without the password hash and without model validation.
+        user = CachedUser.from_row(user_row._mapping)
+
+        await cache.set(
+            cache_key,
+            encode_user(user),
+            ex=jittered_ttl(s.CACHE_EXPIRATION_TIME, s.CACHE_EXPIRATION_JITTER),
+        )
+        return user
+
+    user = await read_cached_user()
+
+    if not user:
+        # NOTE: Concurrent misses of the same user share one refill instead of all querying the database.
+        user = await user_flights.load(
+            cache, cache_key, read_cached_user, fill_cached_user
+        )
+
+    return user
+
+
+async def _get_cached_user_version(
+    user_id: str, cache: aioredis.Redis, local_cache: LocalCache
+) -> int:
+    """Get the version of the user's stateless access tokens, from the in-process cache when possible."""
+    version_key = user_version_key(user_id)
+    version = local_cache.get(version_key)
+
+    if version is None:
+        version = await get_user_version(cache, user_id)
+        local_cache.set(version_key, version)
+
+    return version
+
+
+# NOTE: This function is used to get the principal of the request from the JWT token. The in-process cache holds the principals themselves, so a hit allocates nothing.
 
 
 async def _get_current_user(
     credentials=Depends(auth_scheme),
-    session: AsyncSession = Depends(get_session),
-    cache: aioredis.Redis = Depends(get_cache),
+    cache: aioredis.Redis = Depends(get_raw_cache),
+    local_cache: LocalCache = Depends(get_local_cache),
+    user_flights: SingleFlight = Depends(get_user_flights),
     token_manager: TokenManager = Depends(get_token_manager),
-):
+) -> Principal:
     try:
         verified_token = token_manager.verify_access_token(credentials.credentials)
     except JWTError:
         raise InvalidCredentialsException()
 
-    # NOTE: Check if the user is in the cache:
-    try:
-        cached_user = await cache.get(f"user_id:{verified_token.id}")
-    except aioredis.RedisError:
-        cached_user = None
+    # NOTE: Stateless tokens carry role and verified, only their version is checked, against the in-process cache.
+    if s.STATELESS_ACCESS_TOKENS and verified_token.version is not None:
+        try:
+            version = await _get_cached_user_version(
+                verified_token.id, cache, local_cache
+            )
+        except aioredis.RedisError:
+            version = None
 
-    user = User.model_validate(json.loads(cached_user)) if cached_user else None
+        if version is not None:
+            if verified_token.version < version:
+                raise InvalidCredentialsException()
 
-    if not user:
-        user_dao = UserDAO(session, cache)
-        user = await user_dao.get_user_by_id(verified_token.id)
+            return Principal(
+                id=verified_token.id,
+                role=verified_token.role,
+                verified=bool(verified_token.verified),
+            )
 
-        if not user:
-            raise InvalidCredentialsException()
+    cache_key = f"user_id:{verified_token.id}"
 
-        await cache.set(
-            f"user_id:{verified_token.id}",
-            json.dumps(user.model_dump()).decode("utf-8"),
-            ex=s.CACHE_EXPIRATION_TIME,
-        )
+    # NOTE: Check if the principal is in the in-process cache first, then build it from the user cached in Redis:
+    principal = local_cache.get(cache_key)
 
-    if user is None:
-        raise InvalidCredentialsException()
+    if principal:
+        return principal
 
-    return user
+    user = await _load_cached_user(verified_token.id, cache, user_flights)
+    principal = Principal.from_user(user)
+
+    local_cache.set(cache_key, principal)
+    return principal
 
 
 # NOTE: Simple function that check is the user is verified.
 
 
-async def get_current_active_user(user: User = Depends(_get_current_user)):
-    if user.verified:
-        return user
+async def get_current_active_user(
+    principal: Principal = Depends(_get_current_user),
+) -> Principal:
+    if principal.verified:
+        return principal
     else:
         raise EmailNotVerifiedException()
+
+
+# NOTE: For the routes returning the profile of the current user, the cached user is only loaded here.
+
+
+async def get_current_user_profile(
+    principal: Principal = Depends(get_current_active_user),
+    cache: aioredis.Redis = Depends(get_raw_cache),
+    user_flights: SingleFlight = Depends(get_user_flights),
+) -> CachedUser:
+    return await _load_cached_user(principal.id, cache, user_flights)
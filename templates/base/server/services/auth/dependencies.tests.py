@@ -0,0 +1,152 @@
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import pytest
+from server.config import settings as s
+from server.db.cache import LocalCache
+from server.db.cache import SingleFlight
+from server.db.user.cache import CachedUser
+from server.db.user.cache import encode_user
+from server.db.user.schema import UserRole
+from server.exceptions.auth import EmailNotVerifiedException
+from server.exceptions.auth import InvalidCredentialsException
+from server.services.auth.dependencies import _get_current_user
+from server.services.auth.dependencies import get_current_active_user
+from server.utils import nowutc
+from server.utils.security.principal import Principal
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_builds_and_keeps_the_principal():
+    cache = AsyncMock()
+    cache.get.return_value = encode_user(
+        CachedUser(
+            id="123",
+            first_name="John",
+            last_name="Doe",
+            email="john.doe@example.com",
+            role=UserRole.ADMIN,
+            verified=nowutc(),
+        )
+    )
+    token_manager = MagicMock()
+    token_manager.verify_access_token.return_value = MagicMock(id="123")
+    local_cache = LocalCache(max_size=10, ttl=30)
+
+    async def get_principal():
+        return await _get_current_user(
+            credentials=MagicMock(credentials="access_token"),
+            cache=cache,
+            local_cache=local_cache,
+            user_flights=SingleFlight(lock_ttl=5, wait_timeout=1, poll_interval=0.01),
+            token_manager=token_manager,
+        )
+
+    principal = await get_principal()
+
+    assert principal == Principal(id="123", role=UserRole.ADMIN, verified=True)
+
+    # The second request is answered by the in-process cache
+    assert await get_principal() is principal
+    cache.get.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_refills_through_its_own_session():
+    cache = AsyncMock()
+    cache.get.return_value = None
+    token_manager = MagicMock()
+    token_manager.verify_access_token.return_value = MagicMock(id="123", version=None)
+    user_row = MagicMock(
+        _mapping={
+            "id": "123",
+            "first_name": "John",
+            "last_name": "Doe",
+            "email": "john.doe@example.com",
+            "role": UserRole.USER,
+            "verified": nowutc(),
+            "created_at": nowutc(),
+            "updated_at": nowutc(),
+        }
+    )
+    fill_session = MagicMock()
+
+    @asynccontextmanager
+    async def open_session():
+        yield fill_session
+
+    with (
+        patch("server.services.auth.dependencies.open_session", open_session),
+        patch("server.services.auth.dependencies.UserDAO") as user_dao,
+    ):
+        user_dao.return_value.get_user_row_by_id = AsyncMock(return_value=user_row)
+
+        principal = await _get_current_user(
+            credentials=MagicMock(credentials="access_token"),
+            cache=cache,
+            local_cache=LocalCache(max_size=10, ttl=30),
+            user_flights=SingleFlight(lock_ttl=5, wait_timeout=1, poll_interval=0.01),
+            token_manager=token_manager,
+        )
+
+    assert principal == Principal(id="123", role=UserRole.USER, verified=True)
+    user_dao.assert_called_once_with(fill_session, cache)
+    cache.set.assert_awaited()
+
+
+def _stateless_token(version: int):
+    token_manager = MagicMock()
+    token_manager.verify_access_token.return_value = MagicMock(
+        id="123", role=UserRole.USER, verified=True, version=version
+    )
+    return token_manager
+
+
+async def _authenticate(token_manager, cache, local_cache):
+    return await _get_current_user(
+        credentials=MagicMock(credentials="access_token"),
+        cache=cache,
+        local_cache=local_cache,
+        user_flights=MagicMock(),
+        token_manager=token_manager,
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_trusts_stateless_claims_of_the_current_version():
+    cache = AsyncMock()
+    cache.get.return_value = b"1700000000000"
+    local_cache = LocalCache(max_size=10, ttl=30)
+
+    with patch.object(s, "STATELESS_ACCESS_TOKENS", True):
+        for _ in range(3):
+            principal = await _authenticate(
+                _stateless_token(1700000000000), cache, local_cache
+            )
+
+    assert principal == Principal(id="123", role=UserRole.USER, verified=True)
+
+    # Only the version was read from Redis, once
+    cache.get.assert_awaited_once_with("user_version:123")
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_rejects_revoked_stateless_token():
+    local_cache = LocalCache(max_size=10, ttl=30)
+    local_cache.set("user_version:123", 1700000000001)
+
+    with patch.object(s, "STATELESS_ACCESS_TOKENS", True):
+        with pytest.raises(InvalidCredentialsException):
+            await _authenticate(
+                _stateless_token(1700000000000), AsyncMock(), local_cache
+            )
+
+
+@pytest.mark.asyncio
+async def test_get_current_active_user_rejects_unverified_principal():
+    with pytest.raises(EmailNotVerifiedException):
+        await get_current_active_user(
+            Principal(id="123", role=UserRole.USER, verified=False)
+        )
@@ -52,7 +52,7 @@ class AuthService:
         if not user:
             raise UserNotCreatedException()
 
-        send_email = await self._email_service.send_validation_email(
+        send_email = await self._create_validation_email(
             user=user, validation_token_type=ValidationTokenType.VERIFICATION
         )
         task_manager.add_task(send_email)
@@ -73,7 +73,7 @@ class AuthService:
 
         device_id = await self._device_manager.parse_user_device(request, user.id)
         access_token = self._token_manager.create_access_token(
-            data={"sub": user.id, "role": user.role}
+            data=await self._token_manager.access_token_claims(user)
         )
         refresh_token = await self._token_manager.create_refresh_token(
             data={"sub": user.id, "device_id": device_id}
@@ -82,32 +82,42 @@ class AuthService:
         return AuthResponse(
             access_token=access_token,
             refresh_token=refresh_token,
-            user=UserResponse(**user.model_dump()),
+            user=UserResponse.model_validate(user, from_attributes=True),
         )
 
     async def refresh_access_token(self, token: str) -> AuthResponse:
         """Refresh the access token. Uses the refresh token to get the user and create a new access token."""
-        refresh_token = await self._token_manager.verify_refresh_token(token)
-        user = await self._user_dao.get_user_by_id(refresh_token.user_id)
+        jti = self._token_manager.get_refresh_token_jti(token)
+        rotated_tokens = await self._token_manager.get_rotated_tokens(jti)
 
-        if not user:
-            raise UserNotFoundException()
+        if rotated_tokens:
+            return rotated_tokens
 
-        new_access_token = self._token_manager.create_access_token(
-            data={"sub": user.id, "role": user.role}
-        )
-        new_refresh_token = await self._token_manager.create_refresh_token(
-            data={"sub": user.id, "device_id": refresh_token.device_id}
-        )
+        try:
+            new_refresh_token, user = await self._token_manager.rotate_refresh_token(
+                token
+            )
+        except TokenNotFoundException:
+            # NOTE: Another tab sharing the cookie may be rotating this very token.
+            rotated_tokens = await self._token_manager.wait_for_rotated_tokens(jti)
 
-        await self._token_manager.invalidate_refresh_token(refresh_token.jti)
+            if not rotated_tokens:
+                raise
 
-        return AuthResponse(
+            return rotated_tokens
+
+        new_access_token = self._token_manager.create_access_token(
+            data=await self._token_manager.access_token_claims(user)
+        )
+        new_tokens = AuthResponse(
             access_token=new_access_token,
             refresh_token=new_refresh_token,
             user=UserResponse(**user.model_dump()),
         )
 
+        self._token_manager.store_rotated_tokens(jti, new_tokens)
+        return new_tokens
+
     def set_refresh_cookie(self, data: AuthResponse, response: Response):
         """Helper function to set the refresh token cookie."""
         response.set_cookie(
@@ -123,12 +133,16 @@ class AuthService:
     async def activate_account(self, validation_token: str):
         """Verify the email address. Uses the token to activate the user's account."""
         try:
-            user, token = await self._token_manager.verify_validation_token(
-                validation_token
-            )
+            # NOTE: Consumed up front, a concurrent click on the same link finds nothing left to use.
+            token = await self._token_manager.consume_validation_token(validation_token)
 
             if token.expires_at < nowutc():
-                await self._email_service.send_validation_email(
+                user = await self._user_dao.get_user_by_id(token.user_id)
+
+                if not user:
+                    raise InvalidVerificationTokenException()
+
+                await self._create_validation_email(
                     user=user, validation_token_type=ValidationTokenType.VERIFICATION
                 )
                 return {
@@ -136,8 +150,7 @@ class AuthService:
                 }
 
             updated_user = UserUpdateRequest(verified=nowutc())
-            await self._user_dao.update_user(user.id, updated_user)
-            await self._token_manager.invalidate_validation_token(token.token)
+            await self._user_dao.update_user(token.user_id, updated_user)
             return {
                 "message": "Successfully verified email address. Your account is now activated."
             }
@@ -152,30 +165,31 @@ class AuthService:
         if not user:
             raise UserNotFoundException()
 
-        await self._email_service.send_validation_email(
+        await self._create_validation_email(
             user=user, validation_token_type=ValidationTokenType.PASSWORD_RESET
         )
 
     async def reset_password(self, validation_token: str, data: PasswordResetRequest):
         """Reset the password. Uses the token to find the user's account and update the password."""
+        # NOTE: Checked before consuming the token, so the user can retry with the same link.
+        if data.password != data.confirm_password:
+            return {"message": "New passwords do not match. Please try again."}
+
         try:
-            user, token = await self._token_manager.verify_validation_token(
-                validation_token
-            )
+            token = await self._token_manager.consume_validation_token(validation_token)
 
             if token.expires_at < nowutc():
                 return {
                     "message": "Verification link as expired. If you did not request a password reset, please ignore this warning. Otherwise, please request a new password reset link."
                 }
 
-            if data.password != data.confirm_password:
-                return {"message": "New passwords do not match. Please try again."}
-
-            hashed_password = self._pwd_manager.hash_password(data.password)
+            hashed_password = await self._pwd_manager.hash_password(data.password)
 
             updated_user = UserUpdateRequest(password=hashed_password)
-            await self._user_dao.update_user(user.id, updated_user)
-            await self._token_manager.invalidate_validation_token(token.token)
+            await self._user_dao.update_user(token.user_id, updated_user)
+
+            # NOTE: A reset password signs the user out of every device.
+            await self._token_manager.invalidate_user_refresh_tokens(token.user_id)
             return {
                 "message": "Your password has been successfully reset. Your can now login using your new password."
             }
@@ -203,11 +217,26 @@ class AuthService:
 
     # NOTE: Protected class methods:
 
+    async def _create_validation_email(
+        self, user: User, validation_token_type: ValidationTokenType
+    ):
+        """Issue a validation token for the user and build the email that delivers it."""
+        validation_token = await self._token_manager.create_validation_token(
+            user.id, validation_token_type
+        )
+        return await self._email_service.send_validation_email(
+            user=user,
+            validation_token=validation_token,
+            validation_token_type=validation_token_type,
+        )
+
     async def _authenticate_user(self, user_data: LoginRequest):
-        """Authenticate a user. Uses a Pydantic model to validate the data."""
-        user = await self._user_dao.get_user_by_email(user_data.email)
+        """Authenticate a user. Uses a Pydantic model to validate the data and returns the login columns of the user."""
+        user = await self._user_dao.get_login_credentials(user_data.email)
 
         if user:
-            if self._pwd_manager.verify_password(user.password, user_data.password):
+            if await self._pwd_manager.verify_password(
+                user.password, user_data.password
+            ):
                 return user
         return None
@@ -4,6 +4,7 @@ from unittest.mock import MagicMock
 
 import pytest
 from server.db.auth.schema import ValidationTokenType
+from server.db.user.schema import User
 from server.exceptions.auth import EmailNotVerifiedException
 from server.exceptions.auth import InvalidCredentialsException
 from server.exceptions.auth import InvalidRefreshTokenException
@@ -30,7 +31,10 @@ async def test_register_success(
     sample_new_user_response,
 ):
     # Mock behavior
-    mock_user_service.create_user.return_value = sample_new_user_response
+    new_user = User(
+        id="123", password="hashed_password", **sample_new_user_response.model_dump()
+    )
+    mock_user_service.create_user.return_value = new_user
     mock_email_service.send_validation_email.return_value = AsyncMock()
 
     # Call the method
@@ -39,7 +43,7 @@ async def test_register_success(
     )
 
     # Validate the result
-    assert result == sample_new_user_response
+    assert result == new_user
     assert result.first_name == "John"
     assert result.email == "john.doe@example.com"
     assert len(mock_background_tasks.tasks) == 1
@@ -90,14 +94,16 @@ async def test_register_email_not_created(
 async def test_login_success(
     mock_auth_service,
     sample_login_request,
-    sample_user,
+    mock_current_user_with_id,
     mock_token_manager,
     mock_device_manager,
     sample_access_token_response,
     sample_refresh_token_login_response,
 ):
     # Mock the protected _authenticate_user method
-    mock_auth_service._authenticate_user = AsyncMock(return_value=sample_user)
+    mock_auth_service._authenticate_user = AsyncMock(
+        return_value=mock_current_user_with_id(email="john.doe@example.com")
+    )
 
     # Mock TokenManager and DeviceManager behavior
     mock_token_manager.create_access_token.return_value = sample_access_token_response
@@ -147,17 +153,19 @@ async def test_login_unverified_email(
 
 @pytest.mark.asyncio
 async def test_refresh_access_token_success(
-    mock_auth_service, mock_token_manager, sample_refresh_token_response, sample_user
+    mock_auth_service, mock_token_manager, sample_user
 ):
     # Mock the TokenManager
-    mock_token_manager.verify_refresh_token.return_value = sample_refresh_token_response
+    mock_token_manager.get_rotated_tokens.return_value = None
     mock_token_manager.create_access_token.return_value = AccessTokenResponse(
         token="new_access_token", token_type="Bearer"
     )
-    mock_token_manager.create_refresh_token.return_value = RefreshTokenResponse(
-        token="new_refresh_token", expires_at=nowutc() + timedelta(days=30)
+    mock_token_manager.rotate_refresh_token.return_value = (
+        RefreshTokenResponse(
+            token="new_refresh_token", expires_at=nowutc() + timedelta(days=30)
+        ),
+        sample_user,
     )
-    mock_auth_service._user_dao.get_user_by_id.return_value = sample_user
 
     # Call the method
     result = await mock_auth_service.refresh_access_token("valid_refresh_token")
@@ -166,6 +174,38 @@ async def test_refresh_access_token_success(
     assert result.access_token.token == "new_access_token"
     assert result.refresh_token.token == "new_refresh_token"
     assert result.user.email == "john.doe@example.com"
+    mock_token_manager.store_rotated_tokens.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_refresh_access_token_reused_within_grace_window(
+    mock_auth_service, mock_token_manager, sample_auth_response
+):
+    # Mock the TokenManager to return the pair issued by a previous rotation
+    mock_token_manager.get_rotated_tokens.return_value = sample_auth_response
+
+    # Call the method
+    result = await mock_auth_service.refresh_access_token("rotated_refresh_token")
+
+    # Assert the cached pair is returned without touching the database
+    assert result == sample_auth_response
+    mock_token_manager.rotate_refresh_token.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_refresh_access_token_concurrent_rotation(
+    mock_auth_service, mock_token_manager, sample_auth_response
+):
+    # Mock a concurrent request rotating the same token first
+    mock_token_manager.get_rotated_tokens.return_value = None
+    mock_token_manager.rotate_refresh_token.side_effect = TokenNotFoundException()
+    mock_token_manager.wait_for_rotated_tokens.return_value = sample_auth_response
+
+    # Call the method
+    result = await mock_auth_service.refresh_access_token("refresh_token")
+
+    # Assert the pair issued by the concurrent rotation is returned
+    assert result == sample_auth_response
 
 
 @pytest.mark.asyncio
@@ -173,7 +213,9 @@ async def test_refresh_access_token_invalid_refresh_token(
     mock_auth_service, mock_token_manager, sample_refresh_token
 ):
     # Mock the TokenManager to raise an exception
-    mock_token_manager.verify_refresh_token.side_effect = InvalidRefreshTokenException()
+    mock_token_manager.get_refresh_token_jti.side_effect = (
+        InvalidRefreshTokenException()
+    )
 
     # Call the method
     with pytest.raises(InvalidRefreshTokenException):
@@ -185,7 +227,9 @@ async def test_refresh_access_token_refresh_token_not_found(
     mock_auth_service, mock_token_manager, sample_refresh_token
 ):
     # Mock the TokenManager to raise an exception
-    mock_token_manager.verify_refresh_token.side_effect = TokenNotFoundException()
+    mock_token_manager.get_rotated_tokens.return_value = None
+    mock_token_manager.wait_for_rotated_tokens.return_value = None
+    mock_token_manager.rotate_refresh_token.side_effect = TokenNotFoundException()
 
     # Call the method
     with pytest.raises(TokenNotFoundException):
@@ -221,9 +265,8 @@ async def test_activate_account_success(
     mock_auth_service, mock_token_manager, sample_user
 ):
     # Mock the TokenManager
-    mock_token_manager.verify_validation_token.return_value = (
-        sample_user,
-        MagicMock(token="valid_token", expires_at=nowutc() + timedelta(minutes=10)),
+    mock_token_manager.consume_validation_token.return_value = MagicMock(
+        user_id="123", token="valid_token", expires_at=nowutc() + timedelta(minutes=10)
     )
 
     # Call the method
@@ -238,13 +281,13 @@ async def test_activate_account_success(
 
 @pytest.mark.asyncio
 async def test_activate_account_expired_token(
-    mock_auth_service, mock_token_manager, sample_user
+    mock_auth_service, mock_token_manager, mock_user_dao, sample_user
 ):
-    # Mock the TokenManager
-    mock_token_manager.verify_validation_token.return_value = (
-        sample_user,
-        MagicMock(token="valid_token", expires_at=nowutc() - timedelta(minutes=10)),
+    # Mock the TokenManager and the UserDAO
+    mock_token_manager.consume_validation_token.return_value = MagicMock(
+        user_id="123", token="valid_token", expires_at=nowutc() - timedelta(minutes=10)
     )
+    mock_user_dao.get_user_by_id.return_value = sample_user
 
     # Call the method
     result = await mock_auth_service.activate_account("valid_token")
@@ -281,9 +324,8 @@ async def test_reset_password_success(
     mock_auth_service, mock_token_manager, sample_user
 ):
     # Mock TokenManager
-    mock_token_manager.verify_validation_token.return_value = (
-        sample_user,
-        MagicMock(token="valid_token", expires_at=nowutc() + timedelta(minutes=10)),
+    mock_token_manager.consume_validation_token.return_value = MagicMock(
+        user_id="123", token="valid_token", expires_at=nowutc() + timedelta(minutes=10)
     )
 
     # Mock PasswordManager
@@ -300,46 +342,30 @@ async def test_reset_password_success(
         result["message"]
         == "Your password has been successfully reset. Your can now login using your new password."
     )
+    mock_token_manager.invalidate_user_refresh_tokens.assert_awaited_once_with("123")
 
 
 @pytest.mark.asyncio
-async def test_reset_password_password_mismatch(
-    mock_auth_service, mock_token_manager, sample_user
-):
-    # Mock the TokenManager
-    mock_token_manager.verify_validation_token.return_value = (
-        sample_user,
-        MagicMock(
-            user_id="123",
-            token="valid_token",
-            expires_at=nowutc() + timedelta(minutes=10),
-            token_type=ValidationTokenType.PASSWORD_RESET,
-        ),
-    )
-
+async def test_reset_password_password_mismatch(mock_auth_service, mock_token_manager):
     # Call the method
     result = await mock_auth_service.reset_password(
         "valid_token",
         PasswordResetRequest(password="new_password", confirm_password="new_psord"),
     )
 
-    # Assert expected behavior
+    # Assert the token is left for a retry
     assert result["message"] == "New passwords do not match. Please try again."
+    mock_token_manager.consume_validation_token.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_reset_password_expired_token(
-    mock_auth_service, mock_token_manager, sample_user
-):
+async def test_reset_password_expired_token(mock_auth_service, mock_token_manager):
     # Mock the TokenManager
-    mock_token_manager.verify_validation_token.return_value = (
-        sample_user,
-        MagicMock(
-            user_id="123",
-            token="valid_token",
-            expires_at=nowutc() - timedelta(minutes=10),
-            token_type=ValidationTokenType.PASSWORD_RESET,
-        ),
+    mock_token_manager.consume_validation_token.return_value = MagicMock(
+        user_id="123",
+        token="valid_token",
+        expires_at=nowutc() - timedelta(minutes=10),
+        token_type=ValidationTokenType.PASSWORD_RESET,
     )
 
     # Call the method
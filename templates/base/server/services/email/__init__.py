@@ -1,8 +1,25 @@
-from fastapi import Depends
-from server.utils.security import get_token_manager
+from server.utils.core.logging.logger import logger
 
 from .service import EmailService
 
+# NOTE: The email service holds the FastMail connection config and the template environment, so it is built once per worker:
 
-def get_email_service(token_manager=Depends(get_token_manager)) -> EmailService:
-    return EmailService(token_manager=token_manager)
+email_service: EmailService | None = None
+
+
+def init_email_service():
+    global email_service
+
+    try:
+        email_service = EmailService()
+    except ValueError as e:
+        # NOTE: A missing mail configuration should not prevent the app from starting.
+        logger.error(f"Email service could not be configured: {e}")
+
+
+def get_email_service() -> EmailService:
+    global email_service
+
+    if not email_service:
+        email_service = EmailService()
+    return email_service
@@ -12,7 +12,6 @@ from pydantic import EmailStr
 from server.config import settings as s
 from server.db.auth.schema import ValidationTokenType
 from server.db.user.schema import User
-from server.utils.security.tokens import TokenManager
 
 
 class EmailSchema(BaseModel):
@@ -23,19 +22,20 @@ class EmailSchema(BaseModel):
 
 
 class EmailService:
-    def __init__(self, token_manager: TokenManager):
-        self._mail = FastMail(self._get_email_config())
-        self._token_manager = token_manager
+    def __init__(self):
+        config = self._get_email_config()
+        self._mail = FastMail(config)
+        self._templates = config.template_engine()
 
     # NOTE: Public email service methods:
 
     async def send_validation_email(
-        self, user: User, validation_token_type: ValidationTokenType
+        self,
+        user: User,
+        validation_token: str,
+        validation_token_type: ValidationTokenType,
     ):
         """Process the user email verification."""
-        validation_token = await self._token_manager.create_validation_token(
-            user.id, validation_token_type
-        )
         email_data = self._generate_validation_email_data(
             user, validation_token, validation_token_type
         )
@@ -79,24 +79,21 @@ class EmailService:
         )
 
     async def _from_verification_template(self, email: EmailSchema):
-        message = MessageSchema(
-            subject=email.subject,
-            template_body=email.body,
-            recipients=email.email,
-            subtype=email.subtype,
-        )
-        await self._mail.send_message(message, template_name="verification_email.html")
+        await self._send_from_template(email, "verification_email.html")
 
     async def _from_password_reset_template(self, email: EmailSchema):
+        await self._send_from_template(email, "password_reset_email.html")
+
+    async def _send_from_template(self, email: EmailSchema, template_name: str):
+        # NOTE: Templates are rendered through the service's own Jinja environment so compiled templates are reused across sends.
+        template = self._templates.get_template(template_name)
         message = MessageSchema(
             subject=email.subject,
-            template_body=email.body,
+            body=template.render(**email.body),
             recipients=email.email,
             subtype=email.subtype,
         )
-        await self._mail.send_message(
-            message, template_name="password_reset_email.html"
-        )
+        await self._mail.send_message(message)
 
     # NOTE: Email service configuration builder:
 
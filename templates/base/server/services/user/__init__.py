@@ -2,11 +2,15 @@ from fastapi import Depends
 from server.db import get_cache
 from server.db import get_session
 from server.db.user.dao import UserDAO
+from server.utils.security import get_token_manager
+from server.utils.security.tokens import TokenManager
 
 from .service import UserService
 
 
 async def get_user_service(
-    session=Depends(get_session), cache=Depends(get_cache)
+    session=Depends(get_session),
+    cache=Depends(get_cache),
+    token_manager: TokenManager = Depends(get_token_manager),
 ) -> UserService:
-    return UserService(UserDAO(session, cache))
+    return UserService(UserDAO(session, cache), token_manager)
@@ -1,61 +1,147 @@
+import csv
+import io
+from datetime import datetime
+from enum import Enum
+from typing import Any
+from typing import AsyncIterator
 from typing import Sequence
+from typing import Tuple
 
+import orjson
+from server.config import settings as s
+from server.db.user.dao import USER_EXPORT_COLUMNS
 from server.db.user.dao import UserDAO
 from server.db.user.schema import User
 from server.db.user.schema import UserRole
-from server.exceptions.user import UserNotFoundException
+from server.exceptions.user import InvalidCursorException
 from server.exceptions.user import UserRoleNotAllowedException
-from server.exceptions.user import UserWithEmailAlreadyExistsException
+from server.models import ExportFormat
 from server.models import UserCreateRequest
 from server.models import UserUpdateRequest
+from server.utils.pagination import decode_cursor
+from server.utils.pagination import encode_cursor
 from server.utils.security import get_password_manager
 from server.utils.security.password import PasswordManager
+from server.utils.security.principal import Principal
+from server.utils.security.tokens import TokenManager
+
+# NOTE: Updating any of these signs the user out of every device, the refresh tokens issued so far are revoked.
+REFRESH_REVOKING_FIELDS = frozenset({"role", "password"})
 
 
 class UserService:
-    def __init__(self, user_dao: UserDAO):
+    def __init__(self, user_dao: UserDAO, token_manager: TokenManager):
         self._user_dao: UserDAO = user_dao
+        self._token_manager = token_manager
         self._pwd_manager: PasswordManager = get_password_manager()
 
-    async def get_user(self, user_id: str, current_user: User) -> User | None:
+    async def get_user(self, user_id: str, current_user: Principal) -> User | None:
         self._check_user_permission(user_id, current_user)
         user = await self._user_dao.get_user_by_id(user_id)
         return user
 
-    async def get_users(self, current_user: User) -> Sequence[User]:
+    async def get_users(
+        self,
+        current_user: Principal,
+        cursor: str | None = None,
+        limit: int | None = None,
+    ) -> Tuple[Sequence[User], str | None]:
+        """Get a page of users and the cursor of the next page, None on the last page."""
         self._require_admin(current_user)
-        users = await self._user_dao.get_users()
-        return users
+        limit = min(limit or s.DEFAULT_PAGE_SIZE, s.MAX_PAGE_SIZE)
 
-    async def create_user(self, user_data: UserCreateRequest) -> User:
         try:
-            user = await self._user_dao.get_user_by_email(user_data.email)
-            if user:
-                raise UserWithEmailAlreadyExistsException()
-        except UserNotFoundException:
-            pass
+            after = tuple(decode_cursor(cursor, 2)) if cursor else None
+        except ValueError:
+            raise InvalidCursorException()
+
+        # NOTE: One extra row tells whether another page follows without a COUNT.
+        users = await self._user_dao.get_users(limit + 1, after)
+
+        if len(users) <= limit:
+            return users, None
+
+        users = users[:limit]
+        return users, encode_cursor(users[-1].last_name, users[-1].id)
+
+    def export_users(
+        self, current_user: Principal, export_format: ExportFormat
+    ) -> AsyncIterator[bytes]:
+        """Check the permissions up front and return the export as an iterator of UTF-8 chunks, one per batch."""
+        self._require_admin(current_user)
+
+        if export_format == ExportFormat.CSV:
+            return self._export_csv()
+        return self._export_ndjson()
+
+    async def _export_ndjson(self) -> AsyncIterator[bytes]:
+        # NOTE: orjson writes the datetimes and the enums natively, without a default hook per value.
+        async for rows in self._user_dao.stream_users(s.EXPORT_BATCH_SIZE):
+            yield b"".join(orjson.dumps(dict(row)) + b"\n" for row in rows)
+
+    async def _export_csv(self) -> AsyncIterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
 
-        user_data.password = self._pwd_manager.hash_password(user_data.password)
+        # NOTE: The header goes out before the stream is opened, the client sees the response start right away.
+        writer.writerow(column.key for column in USER_EXPORT_COLUMNS)
+        yield _drain(buffer)
+
+        async for rows in self._user_dao.stream_users(s.EXPORT_BATCH_SIZE):
+            writer.writerows(
+                [_export_value(value) for value in row.values()] for row in rows
+            )
+            yield _drain(buffer)
+
+    async def create_user(self, user_data: UserCreateRequest) -> User:
+        # NOTE: No lookup first, insert_user raises UserWithEmailAlreadyExistsException when the email is taken.
+        user_data.password = await self._pwd_manager.hash_password(user_data.password)
         new_user = await self._user_dao.insert_user(user_data)
         return new_user
 
     async def update_user(
-        self, user_id: str, user_data: UserUpdateRequest, current_user: User
+        self, user_id: str, user_data: UserUpdateRequest, current_user: Principal
     ) -> User:
         self._check_user_permission(user_id, current_user)
         updated_user = await self._user_dao.update_user(user_id, user_data)
+
+        if not REFRESH_REVOKING_FIELDS.isdisjoint(
+            user_data.model_dump(exclude_none=True)
+        ):
+            await self._token_manager.invalidate_user_refresh_tokens(user_id)
+
         return updated_user
 
-    async def delete_user(self, user_id: str, current_user: User) -> None:
+    async def delete_user(self, user_id: str, current_user: Principal) -> None:
         self._check_user_permission(user_id, current_user)
         await self._user_dao.delete_user(user_id)
 
+        # NOTE: The database cascades to the refresh tokens table, the Redis store has to be told.
+        await self._token_manager.invalidate_user_refresh_tokens(user_id)
+
     # NOTE: Permissions check functions:
 
-    def _require_admin(self, current_user: User):
+    def _require_admin(self, current_user: Principal):
         if current_user.role != UserRole.ADMIN:
             raise UserRoleNotAllowedException()
 
-    def _check_user_permission(self, target_user_id: str, current_user: User) -> None:
+    def _check_user_permission(
+        self, target_user_id: str, current_user: Principal
+    ) -> None:
         if current_user.id != target_user_id and current_user.role != UserRole.ADMIN:
             raise UserRoleNotAllowedException()
+
+
+def _drain(buffer: io.StringIO) -> bytes:
+    chunk = buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
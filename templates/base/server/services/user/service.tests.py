@@ -1,16 +1,24 @@
+from datetime import datetime
+from datetime import timezone
 from unittest.mock import MagicMock
 
 import pytest
-from server.exceptions.user import UserNotFoundException
+from server.config import settings as s
+from server.db.user.dao import USER_EXPORT_COLUMNS
+from server.db.user.schema import UserRole
+from server.exceptions.user import InvalidCursorException
 from server.exceptions.user import UserRoleNotAllowedException
 from server.exceptions.user import UserWithEmailAlreadyExistsException
+from server.models import ExportFormat
+from server.models import UserUpdateRequest
 from server.services.user.service import UserService
+from server.utils.pagination import encode_cursor
 
 
 @pytest.mark.asyncio
-async def test_get_user_success(mock_user_dao, sample_user):
+async def test_get_user_success(mock_user_dao, mock_token_manager, sample_user):
     # Create an instance of UserService with the mocked DAO
-    user_service = UserService(user_dao=mock_user_dao)
+    user_service = UserService(user_dao=mock_user_dao, token_manager=mock_token_manager)
 
     # Mock the DAO's `get_user_by_id` method
     mock_user_dao.get_user_by_id.return_value = sample_user
@@ -28,9 +36,11 @@ async def test_get_user_success(mock_user_dao, sample_user):
 
 
 @pytest.mark.asyncio
-async def test_get_users_success(mock_user_dao, admin_user, sample_user):
+async def test_get_users_success(
+    mock_user_dao, mock_token_manager, admin_user, sample_user
+):
     # Create an instance of UserService with the mocked DAO
-    user_service = UserService(user_dao=mock_user_dao)
+    user_service = UserService(user_dao=mock_user_dao, token_manager=mock_token_manager)
 
     # Mock the DAO's `get_users` method
     mock_user_dao.get_users.return_value = [sample_user]
@@ -42,15 +52,51 @@ async def test_get_users_success(mock_user_dao, admin_user, sample_user):
     result = await user_service.get_users(current_user=admin_user)
 
     # Assert the result
-    assert result == [sample_user]
-    mock_user_dao.get_users.assert_called_once()
+    assert result == ([sample_user], None)
+    mock_user_dao.get_users.assert_called_once_with(s.DEFAULT_PAGE_SIZE + 1, None)
     user_service._require_admin.assert_called_once_with(admin_user)
 
 
 @pytest.mark.asyncio
-async def test_get_users_non_admin_raises_exception(mock_user_dao, sample_user):
+async def test_get_users_returns_next_cursor(
+    mock_user_dao, mock_token_manager, admin_user, mock_current_user_with_id
+):
+    user_service = UserService(user_dao=mock_user_dao, token_manager=mock_token_manager)
+    users = [mock_current_user_with_id(user_id=str(i)) for i in range(3)]
+    mock_user_dao.get_users.return_value = users
+
+    # A full page plus one extra row means another page follows
+    page, next_cursor = await user_service.get_users(admin_user, limit=2)
+
+    assert page == users[:2]
+    assert next_cursor is not None
+
+    # The cursor resumes after the last row of the page
+    await user_service.get_users(admin_user, cursor=next_cursor, limit=2)
+    mock_user_dao.get_users.assert_called_with(3, (users[1].last_name, users[1].id))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "cursor", ["not-a-cursor", encode_cursor("Doe"), encode_cursor(1, {})]
+)
+async def test_get_users_with_invalid_cursor(
+    mock_user_dao, mock_token_manager, admin_user, cursor
+):
+    user_service = UserService(user_dao=mock_user_dao, token_manager=mock_token_manager)
+
+    with pytest.raises(InvalidCursorException):
+        await user_service.get_users(admin_user, cursor=cursor)
+
+    mock_user_dao.get_users.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_users_non_admin_raises_exception(
+    mock_user_dao, mock_token_manager, sample_user
+):
     # Create an instance of UserService with the mocked DAO
-    user_service = UserService(user_dao=mock_user_dao)
+    user_service = UserService(user_dao=mock_user_dao, token_manager=mock_token_manager)
 
     # Call the service method with a non-admin user and expect an exception
     with pytest.raises(UserRoleNotAllowedException):
@@ -59,13 +105,10 @@ async def test_get_users_non_admin_raises_exception(mock_user_dao, sample_user):
 
 @pytest.mark.asyncio
 async def test_create_user_success(
-    mock_user_dao, sample_user_create_request, sample_user
+    mock_user_dao, mock_token_manager, sample_user_create_request, sample_user
 ):
     # Create an instance of UserService with the mocked DAO
-    user_service = UserService(user_dao=mock_user_dao)
-
-    # Mock the DAO's `get_user_by_email` method to simulate email not found
-    mock_user_dao.get_user_by_email.side_effect = UserNotFoundException()
+    user_service = UserService(user_dao=mock_user_dao, token_manager=mock_token_manager)
 
     # Mock the DAO's `insert_user` method
     mock_user_dao.insert_user.return_value = sample_user
@@ -75,21 +118,19 @@ async def test_create_user_success(
 
     # Assert the result
     assert result == sample_user
-    mock_user_dao.get_user_by_email.assert_called_once_with(
-        sample_user_create_request.email
-    )
+    mock_user_dao.get_user_by_email.assert_not_called()
     mock_user_dao.insert_user.assert_called_once_with(sample_user_create_request)
 
 
 @pytest.mark.asyncio
 async def test_create_user_email_already_exists(
-    mock_user_dao, sample_user_create_request, sample_user
+    mock_user_dao, mock_token_manager, sample_user_create_request, sample_user
 ):
     # Create an instance of UserService with the mocked DAO
-    user_service = UserService(user_dao=mock_user_dao)
+    user_service = UserService(user_dao=mock_user_dao, token_manager=mock_token_manager)
 
-    # Mock the DAO's `get_user_by_email` method to simulate email already exists
-    mock_user_dao.get_user_by_email.return_value = sample_user
+    # Mock the DAO's `insert_user` method to simulate the unique email conflict
+    mock_user_dao.insert_user.side_effect = UserWithEmailAlreadyExistsException()
 
     # Call the service method and expect an exception
     with pytest.raises(UserWithEmailAlreadyExistsException):
@@ -98,10 +139,10 @@ async def test_create_user_email_already_exists(
 
 @pytest.mark.asyncio
 async def test_update_user_success(
-    mock_user_dao, sample_user_update_request, sample_user
+    mock_user_dao, mock_token_manager, sample_user_update_request, sample_user
 ):
     # Create an instance of UserService with the mocked DAO
-    user_service = UserService(user_dao=mock_user_dao)
+    user_service = UserService(user_dao=mock_user_dao, token_manager=mock_token_manager)
 
     # Mock the DAO's `update_user` method
     mock_user_dao.update_user.return_value = sample_user
@@ -115,13 +156,31 @@ async def test_update_user_success(
     assert result == sample_user
     mock_user_dao.update_user.assert_called_once_with("123", sample_user_update_request)
 
+    # A profile update keeps the user signed in
+    mock_token_manager.invalidate_user_refresh_tokens.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_update_user_role_revokes_refresh_tokens(
+    mock_user_dao, mock_token_manager, admin_user
+):
+    user_service = UserService(user_dao=mock_user_dao, token_manager=mock_token_manager)
+
+    await user_service.update_user(
+        user_id="123",
+        user_data=UserUpdateRequest(role=UserRole.ADMIN),
+        current_user=admin_user,
+    )
+
+    mock_token_manager.invalidate_user_refresh_tokens.assert_awaited_once_with("123")
+
 
 @pytest.mark.asyncio
 async def test_update_user_no_permission_raises_exception(
-    mock_user_dao, sample_user_update_request
+    mock_user_dao, mock_token_manager, sample_user_update_request
 ):
     # Create an instance of UserService with the mocked DAO
-    user_service = UserService(user_dao=mock_user_dao)
+    user_service = UserService(user_dao=mock_user_dao, token_manager=mock_token_manager)
 
     # Simulate a different user
     other_user = MagicMock(id="456", role="user")
@@ -134,21 +193,24 @@ async def test_update_user_no_permission_raises_exception(
 
 
 @pytest.mark.asyncio
-async def test_delete_user_success(mock_user_dao, sample_user):
+async def test_delete_user_success(mock_user_dao, mock_token_manager, sample_user):
     # Create an instance of UserService with the mocked DAO
-    user_service = UserService(user_dao=mock_user_dao)
+    user_service = UserService(user_dao=mock_user_dao, token_manager=mock_token_manager)
 
     # Call the service method
     await user_service.delete_user(user_id="123", current_user=sample_user)
 
     # Assert the DAO's `delete_user` method was called
     mock_user_dao.delete_user.assert_called_once_with("123")
+    mock_token_manager.invalidate_user_refresh_tokens.assert_awaited_once_with("123")
 
 
 @pytest.mark.asyncio
-async def test_delete_user_no_permission_raises_exception(mock_user_dao):
+async def test_delete_user_no_permission_raises_exception(
+    mock_user_dao, mock_token_manager
+):
     # Create an instance of UserService with the mocked DAO
-    user_service = UserService(user_dao=mock_user_dao)
+    user_service = UserService(user_dao=mock_user_dao, token_manager=mock_token_manager)
 
     # Simulate a different user
     other_user = MagicMock(id="456", role="user")
@@ -156,3 +218,62 @@ async def test_delete_user_no_permission_raises_exception(mock_user_dao):
     # Call the service method and expect an exception
     with pytest.raises(UserRoleNotAllowedException):
         await user_service.delete_user(user_id="123", current_user=other_user)
+
+
+def _stream(*batches):
+    async def _stream_users(batch_size):
+        for batch in batches:
+            yield batch
+
+    return _stream_users
+
+
+@pytest.mark.asyncio
+async def test_export_users_as_ndjson(mock_user_dao, mock_token_manager, admin_user):
+    user_service = UserService(user_dao=mock_user_dao, token_manager=mock_token_manager)
+    verified = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    mock_user_dao.stream_users = _stream(
+        [{"id": "1", "role": UserRole.USER, "verified": verified}],
+        [{"id": "2", "role": UserRole.ADMIN, "verified": None}],
+    )
+
+    chunks = [
+        chunk
+        async for chunk in user_service.export_users(admin_user, ExportFormat.NDJSON)
+    ]
+
+    assert chunks == [
+        b'{"id":"1","role":"user","verified":"2024-01-01T00:00:00+00:00"}\n',
+        b'{"id":"2","role":"admin","verified":null}\n',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_export_users_as_csv(
+    mock_user_dao, mock_token_manager, admin_user, mock_current_user_with_id
+):
+    user_service = UserService(user_dao=mock_user_dao, token_manager=mock_token_manager)
+    user = mock_current_user_with_id()
+    mock_user_dao.stream_users = _stream(
+        [{column.key: getattr(user, column.key) for column in USER_EXPORT_COLUMNS}]
+    )
+
+    chunks = [
+        chunk async for chunk in user_service.export_users(admin_user, ExportFormat.CSV)
+    ]
+    header, row, _ = b"".join(chunks).decode().split("\r\n")
+
+    assert header == "id,first_name,last_name,email,role,verified,created_at"
+    assert row.startswith(f"{user.id},Mock,User,{user.email},user,")
+
+    # The header is sent on its own, before the first batch is read
+    assert chunks[0].decode() == header + "\r\n"
+
+
+def test_export_users_non_admin_raises_exception(
+    mock_user_dao, mock_token_manager, sample_user
+):
+    user_service = UserService(user_dao=mock_user_dao, token_manager=mock_token_manager)
+
+    with pytest.raises(UserRoleNotAllowedException):
+        user_service.export_users(sample_user, ExportFormat.CSV)
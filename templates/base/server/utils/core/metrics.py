@@ -0,0 +1,15 @@
+from typing import Any
+from typing import Callable
+from typing import Dict
+
+# NOTE: Components register a collector here so their counters can be exported through the health routes.
+
+_collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register_metrics(name: str, collector: Callable[[], Dict[str, Any]]) -> None:
+    _collectors[name] = collector
+
+
+def collect_metrics() -> Dict[str, Dict[str, Any]]:
+    return {name: collector() for name, collector in _collectors.items()}
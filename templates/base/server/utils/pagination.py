@@ -0,0 +1,28 @@
+import base64
+import json
+from typing import List
+
+# NOTE: Keyset cursors are opaque to clients, they carry the sort key of the last row of a page.
+
+
+def encode_cursor(*values: str) -> str:
+    payload = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[str]:
+    """Decode a cursor made of size string values. Raises a ValueError when the cursor is malformed."""
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Malformed cursor") from e
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Malformed cursor")
+
+    # NOTE: The values are bound to text columns, anything else is a crafted cursor.
+    if not all(isinstance(value, str) for value in values):
+        raise ValueError("Malformed cursor")
+
+    return values
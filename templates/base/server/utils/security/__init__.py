@@ -1,26 +1,101 @@
 from fastapi import Depends
 from redis import asyncio as aioredis
+from server.config import settings as s
 from server.db import get_cache
 from server.db import get_session
 from server.db.auth.dao import AuthDAO
+from server.db.auth.stores import RedisRefreshTokenStore
+from server.db.auth.stores import RedisValidationTokenStore
+from server.db.auth.stores import RefreshTokenStore
+from server.db.auth.stores import SQLRefreshTokenStore
+from server.db.auth.stores import SQLValidationTokenStore
+from server.db.auth.stores import ValidationTokenStore
+from server.db.cache import LocalCache
 from server.db.user.dao import UserDAO
+from server.utils.core.metrics import register_metrics
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .devices import DeviceManager
+from .jwt_codecs import JWTCodec
+from .jwt_codecs import create_jwt_codec
 from .password import PasswordManager
 from .tokens import TokenManager
 
+# NOTE: The password manager owns a thread pool, so a single instance is shared by the whole worker:
+
+pwd_manager: PasswordManager | None = None
+
+
+def init_password_manager():
+    global pwd_manager
+    pwd_manager = PasswordManager(
+        max_workers=s.PASSWORD_HASHER_WORKERS,
+        max_pending=s.PASSWORD_HASHER_MAX_PENDING,
+    )
+    register_metrics("password_hasher", pwd_manager.stats)
+
+
+def close_password_manager():
+    global pwd_manager
+
+    if pwd_manager:
+        pwd_manager.close()
+        pwd_manager = None
+
 
 def get_password_manager() -> PasswordManager:
-    return PasswordManager()
+    if not pwd_manager:
+        init_password_manager()
+    return pwd_manager
+
+
+# NOTE: The JWT codec and the verified access tokens are shared by the whole worker:
+
+jwt_codec: JWTCodec = create_jwt_codec(s.JWT_CODEC, s.AUTH_SECRET, s.ALGORITHM)
+
+verified_access_tokens = LocalCache(
+    max_size=s.ACCESS_TOKEN_CACHE_SIZE, ttl=s.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+)
+register_metrics("verified_access_tokens", verified_access_tokens.stats)
+
+
+def get_refresh_token_store(
+    session: AsyncSession = Depends(get_session),
+    cache: aioredis.Redis = Depends(get_cache),
+) -> RefreshTokenStore:
+    if s.REFRESH_TOKEN_STORE == "redis":
+        return RedisRefreshTokenStore(cache)
+    return SQLRefreshTokenStore(AuthDAO(session))
+
+
+def get_validation_token_store(
+    session: AsyncSession = Depends(get_session),
+    cache: aioredis.Redis = Depends(get_cache),
+) -> ValidationTokenStore:
+    if s.VALIDATION_TOKEN_STORE == "redis":
+        return RedisValidationTokenStore(cache, session)
+    return SQLValidationTokenStore(AuthDAO(session))
 
 
 def get_token_manager(
     session: AsyncSession = Depends(get_session),
     cache: aioredis.Redis = Depends(get_cache),
+    refresh_token_store: RefreshTokenStore = Depends(get_refresh_token_store),
+    validation_token_store: ValidationTokenStore = Depends(get_validation_token_store),
 ) -> TokenManager:
-    return TokenManager(AuthDAO(session), UserDAO(session, cache))
+    return TokenManager(
+        AuthDAO(session),
+        UserDAO(session, cache),
+        cache,
+        refresh_token_store,
+        validation_token_store,
+        codec=jwt_codec,
+        verified_access_tokens=verified_access_tokens,
+    )
 
 
-def get_device_manager(session: AsyncSession = Depends(get_session)) -> DeviceManager:
-    return DeviceManager(AuthDAO(session))
+def get_device_manager(
+    session: AsyncSession = Depends(get_session),
+    refresh_token_store: RefreshTokenStore = Depends(get_refresh_token_store),
+) -> DeviceManager:
+    return DeviceManager(AuthDAO(session), refresh_token_store)
@@ -2,31 +2,21 @@ from typing import cast
 
 from fastapi import Request
 from server.db.auth.dao import AuthDAO
+from server.db.auth.stores import RefreshTokenStore
 from server.models import DeviceData
-from server.models import UpdateDeviceData
 from server.models import UserDevicesData
 from server.utils import nowutc
 from user_agents import parse
 
 
 class DeviceManager:
-    def __init__(self, auth_dao):
+    def __init__(self, auth_dao, refresh_token_store: RefreshTokenStore):
         self._auth_dao: AuthDAO = auth_dao
+        self._refresh_token_store = refresh_token_store
 
     async def get_or_create_device(self, device_data: DeviceData) -> str:
         """Get or create a device. Takes the device data as an argument."""
-        device_id = await self._auth_dao.get_device_id(
-            device_data.raw_user_agent, device_data.ip_address, device_data.user_id
-        )
-
-        if not device_id:
-            device_id = await self._auth_dao.insert_device(device_data)
-        else:
-            last_seen = nowutc()
-            update_device_data = UpdateDeviceData(last_seen=last_seen)
-            await self._auth_dao.update_device(device_id, update_device_data)
-
-        return device_id
+        return await self._auth_dao.upsert_device(device_data)
 
     async def get_devices_by_user_id(self, device_id: str) -> UserDevicesData:
         """Get the devices associated to a specific user_id."""
@@ -35,7 +25,9 @@ class DeviceManager:
         return UserDevicesData(devices=devices_data)
 
     async def revoke_device(self, device_id: str) -> None:
-        """Revoke a specific device."""
+        """Revoke a specific device and the refresh tokens issued to it."""
+        # NOTE: The database cascades to the refresh tokens table, the Redis store has to be told.
+        await self._refresh_token_store.delete_device_tokens(device_id)
         await self._auth_dao.delete_device(device_id)
 
     async def parse_user_device(self, request: Request, user_id: str):
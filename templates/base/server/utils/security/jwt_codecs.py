@@ -0,0 +1,60 @@
+from abc import ABC
+from abc import abstractmethod
+from typing import Any
+from typing import Dict
+
+from jose import JWTError
+from jose import jwt
+
+
+class JWTCodec(ABC):
+    """Signs and verifies the JWTs issued by the TokenManager.
+
+    Every codec raises jose's `JWTError` for an invalid or expired token, so
+    the callers do not depend on the library doing the work.
+    """
+
+    def __init__(self, secret: str, algorithm: str):
+        self._secret = secret
+        self._algorithm = algorithm
+
+    @abstractmethod
+    def encode(self, claims: Dict[str, Any]) -> str: ...
+
+    @abstractmethod
+    def decode(self, token: str) -> Dict[str, Any]: ...
+
+
+class JoseCodec(JWTCodec):
+    def encode(self, claims: Dict[str, Any]) -> str:
+        return jwt.encode(claims, self._secret, algorithm=self._algorithm)
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        return jwt.decode(token, self._secret, algorithms=[self._algorithm])
+
+
+class PyJWTCodec(JWTCodec):
+    """Codec backed by PyJWT, an optional dependency: `pip install PyJWT`."""
+
+    def __init__(self, secret: str, algorithm: str):
+        super().__init__(secret, algorithm)
+
+        import jwt as pyjwt
+
+        self._pyjwt = pyjwt
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        return self._pyjwt.encode(claims, self._secret, algorithm=self._algorithm)
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        try:
+            return self._pyjwt.decode(token, self._secret, algorithms=[self._algorithm])
+        except self._pyjwt.PyJWTError as e:
+            raise JWTError(str(e)) from e
+
+
+JWT_CODECS = {"jose": JoseCodec, "pyjwt": PyJWTCodec}
+
+
+def create_jwt_codec(name: str, secret: str, algorithm: str) -> JWTCodec:
+    return JWT_CODECS[name](secret, algorithm)
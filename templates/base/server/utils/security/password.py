@@ -1,12 +1,92 @@
+import asyncio
+import os
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+from time import perf_counter
+from typing import Any
+from typing import Callable
+from typing import Dict
+
 from argon2 import PasswordHasher
+from argon2.exceptions import VerifyMismatchError
+from server.exceptions.auth import PasswordHasherBusyException
 
 
 class PasswordManager:
-    def __init__(self):
+    """Runs argon2 off the event loop on a dedicated thread pool with a bounded queue."""
+
+    def __init__(self, max_workers: int | None = None, max_pending: int = 64):
         self._ph = PasswordHasher()
+        self._max_workers = max_workers or os.cpu_count() or 1
+        self._max_pending = max_pending
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._max_workers, thread_name_prefix="argon2"
+        )
+
+        # NOTE: The counters are updated from the worker threads when a job ends.
+        self._lock = Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    async def hash_password(self, password: str) -> str:
+        return await self._run(self._ph.hash, password)
+
+    async def verify_password(self, hashed_password: str, password: str) -> bool:
+        return await self._run(self._ph.verify, hashed_password, password)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self._max_workers,
+            "in_flight": self._in_flight,
+            "queue_depth": max(0, self._in_flight - self._max_workers),
+            "max_queue_depth": self._max_pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_latency_ms": (
+                self.total_latency / self.completed * 1000 if self.completed else 0.0
+            ),
+            "max_latency_ms": self.max_latency * 1000,
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            # NOTE: Fail fast instead of letting a login burst pile up behind the pool.
+            if self._in_flight >= self._max_workers + self._max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusyException()
+
+            self._in_flight += 1
+
+        # NOTE: Accounted for when the job itself ends, a cancelled caller leaves a running hash behind on the pool.
+        job = self._executor.submit(fn, *args)
+        job.add_done_callback(partial(self._record, perf_counter()))
+        return await asyncio.wrap_future(job)
+
+    def _record(self, started_at: float, job: Future) -> None:
+        latency = perf_counter() - started_at
+
+        with self._lock:
+            self._in_flight -= 1
+
+            if job.cancelled():
+                return
 
-    def hash_password(self, password: str) -> str:
-        return self._ph.hash(password)
+            # NOTE: A wrong password is a verification that ran to completion, not a failure of the pool.
+            error = job.exception()
+            if error is not None and not isinstance(error, VerifyMismatchError):
+                self.failed += 1
+                return
 
-    def verify_password(self, hashed_password: str, password: str) -> bool:
-        return self._ph.verify(hashed_password, password)
+            self.completed += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
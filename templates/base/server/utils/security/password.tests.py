@@ -0,0 +1,83 @@
+import asyncio
+from threading import Event
+
+import pytest
+from server.exceptions.auth import PasswordHasherBusyException
+from server.utils.security.password import PasswordManager
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_password():
+    pwd_manager = PasswordManager(max_workers=1)
+
+    try:
+        hashed_password = await pwd_manager.hash_password("secure_password")
+
+        assert hashed_password != "secure_password"
+        assert await pwd_manager.verify_password(hashed_password, "secure_password")
+        assert pwd_manager.stats()["completed"] == 2
+        assert pwd_manager.stats()["in_flight"] == 0
+    finally:
+        pwd_manager.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_hash_stays_in_flight_until_the_job_ends():
+    pwd_manager = PasswordManager(max_workers=1)
+    started, release = Event(), Event()
+
+    def slow_hash(password: str) -> str:
+        started.set()
+        release.wait()
+        return password
+
+    try:
+        task = asyncio.create_task(pwd_manager._run(slow_hash, "secure_password"))
+        await asyncio.to_thread(started.wait)
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # The worker is still busy with the hash
+        assert pwd_manager.stats()["in_flight"] == 1
+
+        release.set()
+        await asyncio.to_thread(pwd_manager._executor.shutdown)
+
+        assert pwd_manager.stats()["in_flight"] == 0
+        assert pwd_manager.stats()["completed"] == 1
+    finally:
+        release.set()
+        pwd_manager.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_hash_is_not_counted_as_completed():
+    pwd_manager = PasswordManager(max_workers=1)
+
+    try:
+        with pytest.raises(AttributeError):
+            await pwd_manager.hash_password(None)
+
+        assert pwd_manager.stats()["failed"] == 1
+        assert pwd_manager.stats()["completed"] == 0
+        assert pwd_manager.stats()["in_flight"] == 0
+    finally:
+        pwd_manager.close()
+
+
+@pytest.mark.asyncio
+async def test_hash_password_rejected_when_saturated():
+    pwd_manager = PasswordManager(max_workers=1, max_pending=0)
+
+    # Simulate a hash already running on the only worker
+    pwd_manager._in_flight = 1
+
+    try:
+        with pytest.raises(PasswordHasherBusyException):
+            await pwd_manager.hash_password("secure_password")
+
+        assert pwd_manager.stats()["rejected"] == 1
+    finally:
+        pwd_manager.close()
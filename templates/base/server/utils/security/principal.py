@@ -0,0 +1,17 @@
+from dataclasses import dataclass
+
+from server.db.user.cache import CachedUser
+from server.db.user.schema import UserRole
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Identity of an authenticated request. Routes needing the profile columns load the cached user instead."""
+
+    id: str
+    role: UserRole
+    verified: bool
+
+    @classmethod
+    def from_user(cls, user: CachedUser) -> "Principal":
+        return cls(id=user.id, role=user.role, verified=user.verified is not None)
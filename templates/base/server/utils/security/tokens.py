@@ -1,14 +1,20 @@
+import asyncio
+import hashlib
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
 from typing import Optional
 from typing import Tuple
 
-from jose import jwt
+from jose import JWTError
+from redis import asyncio as aioredis
 from server.config import settings as s
 from server.db.auth.dao import AuthDAO
-from server.db.auth.schema import ValidationToken
 from server.db.auth.schema import ValidationTokenType
+from server.db.auth.stores import RefreshTokenStore
+from server.db.auth.stores import ValidationTokenStore
+from server.db.cache import LocalCache
+from server.db.user.cache import get_user_version
 from server.db.user.dao import UserDAO
 from server.db.user.schema import User
 from server.exceptions.auth import InvalidCredentialsException
@@ -16,22 +22,58 @@ from server.exceptions.auth import InvalidRefreshTokenException
 from server.exceptions.auth import InvalidVerificationTokenException
 from server.exceptions.auth import TokenExpiredException
 from server.exceptions.auth import TokenNotFoundException
+from server.exceptions.user import UserNotFoundException
 from server.models import AccessTokenData
 from server.models import AccessTokenResponse
+from server.models import AuthResponse
 from server.models import RefreshTokenData
 from server.models import RefreshTokenResponse
 from server.models import ValidationTokenData
 from server.utils import cuid
 from server.utils import nowutc
+from server.utils.security.jwt_codecs import JoseCodec
+from server.utils.security.jwt_codecs import JWTCodec
+
+# NOTE: How long a duplicate refresh waits for a concurrent rotation of the same token to publish its result.
+ROTATION_WAIT_ATTEMPTS = 5
+ROTATION_WAIT_INTERVAL = 0.05
 
 
 class TokenManager:
-    def __init__(self, auth_dao: AuthDAO, user_dao: UserDAO):
+    def __init__(
+        self,
+        auth_dao: AuthDAO,
+        user_dao: UserDAO,
+        cache: aioredis.Redis,
+        refresh_token_store: RefreshTokenStore,
+        validation_token_store: ValidationTokenStore,
+        codec: JWTCodec | None = None,
+        verified_access_tokens: LocalCache | None = None,
+    ):
         self._auth_dao = auth_dao
         self._user_dao = user_dao
+        self._cache = cache
+        self._refresh_token_store = refresh_token_store
+        self._validation_token_store = validation_token_store
+        self._codec = codec or JoseCodec(s.AUTH_SECRET, s.ALGORITHM)
+        self._verified_access_tokens = verified_access_tokens
 
     # NOTE: Acces token methods:
 
+    async def access_token_claims(self, user) -> dict:
+        """Build the access token claims of a user. Stateless tokens also carry whether the user is verified and the version of the user's tokens."""
+        claims = {"sub": user.id, "role": user.role}
+
+        if s.STATELESS_ACCESS_TOKENS:
+            try:
+                claims["ver"] = await get_user_version(self._cache, user.id)
+                claims["verified"] = user.verified is not None
+            except aioredis.RedisError:
+                # NOTE: Without the version the token is checked against the user cache like a regular one.
+                pass
+
+        return claims
+
     def create_access_token(self, data: dict) -> AccessTokenResponse:
         """Create a JWT access token. Takes the data and the expiration time as arguments."""
         to_encode = data.copy()
@@ -39,13 +81,22 @@ class TokenManager:
             {"exp": self._set_token_expiration(s.ACCESS_TOKEN_EXPIRE_MINUTES)}
         )
 
-        encoded_jwt = jwt.encode(to_encode, s.AUTH_SECRET, algorithm=s.ALGORITHM)
+        encoded_jwt = self._codec.encode(to_encode)
 
         return AccessTokenResponse(token=encoded_jwt, token_type="bearer")
 
     def verify_access_token(self, token: str) -> AccessTokenData:
         """Verify the access token. Takes the token string as an argument."""
-        payload = jwt.decode(token, s.AUTH_SECRET, algorithms=[s.ALGORITHM])
+        # NOTE: Keyed by a digest, the cache holds neither the tokens nor an entry past the token's expiration.
+        token_key = hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+        if self._verified_access_tokens is not None:
+            verified_token = self._verified_access_tokens.get(token_key)
+
+            if verified_token is not None:
+                return verified_token
+
+        payload = self._codec.decode(token)
         user_id: Optional[str] = payload.get("sub")
         exp: Optional[int] = payload.get("exp")
 
@@ -60,7 +111,20 @@ class TokenManager:
         if user_id is None:
             raise InvalidCredentialsException()
 
-        return AccessTokenData(id=user_id, expires_at=datetime_exp)
+        verified_token = AccessTokenData(
+            id=user_id,
+            expires_at=datetime_exp,
+            role=payload.get("role"),
+            verified=payload.get("verified"),
+            version=payload.get("ver"),
+        )
+
+        remaining = (datetime_exp - nowutc()).total_seconds()
+
+        if self._verified_access_tokens is not None and remaining > 0:
+            self._verified_access_tokens.set(token_key, verified_token, remaining)
+
+        return verified_token
 
     # NOTE: Refresh token methods:
 
@@ -80,19 +144,19 @@ class TokenManager:
         )
         await self._store_refresh_token(refresh_token)
 
-        encoded_jwt = jwt.encode(to_encode, s.AUTH_SECRET, algorithm=s.ALGORITHM)
+        encoded_jwt = self._codec.encode(to_encode)
 
         return RefreshTokenResponse(token=encoded_jwt, expires_at=to_encode["exp"])
 
     async def verify_refresh_token(self, token: str) -> RefreshTokenData:
         """Verify the refresh token. Takes the token string as an argument."""
-        payload = jwt.decode(token, s.AUTH_SECRET, algorithms=[s.ALGORITHM])
+        payload = self._codec.decode(token)
         jti: Optional[str] = payload.get("jti")
 
         if jti is None:
             raise InvalidRefreshTokenException()
 
-        refresh_token = await self._auth_dao.get_refresh_token_by_jti(jti)
+        refresh_token = await self._refresh_token_store.get(jti)
 
         if not refresh_token:
             raise TokenNotFoundException()
@@ -100,53 +164,125 @@ class TokenManager:
         if refresh_token.expires_at < nowutc():
             raise TokenExpiredException()
 
-        return RefreshTokenData(**refresh_token.model_dump())
+        return refresh_token
+
+    def get_refresh_token_jti(self, token: str) -> str:
+        """Verify the refresh token signature and return its jti. Takes the token string as an argument."""
+        try:
+            payload = self._codec.decode(token)
+        except JWTError:
+            raise InvalidRefreshTokenException()
+
+        jti: Optional[str] = payload.get("jti")
+
+        if jti is None:
+            raise InvalidRefreshTokenException()
+
+        return jti
+
+    async def rotate_refresh_token(
+        self, token: str
+    ) -> Tuple[RefreshTokenResponse, User]:
+        """Exchange a refresh token for a new one in a single round trip. Takes the token string as an argument and returns the new token with its owner."""
+        jti = self.get_refresh_token_jti(token)
+        new_jti = cuid()
+        expires_at = self._set_token_expiration(s.REFRESH_TOKEN_EXPIRE_MINUTES)
+        rotated = await self._refresh_token_store.rotate(jti, new_jti, expires_at)
+
+        if not rotated:
+            raise TokenNotFoundException()
+
+        user_id, device_id, user = rotated
+
+        if not user:
+            user = await self._user_dao.get_user_by_id(user_id)
+
+        if not user:
+            raise UserNotFoundException()
+
+        encoded_jwt = self._codec.encode(
+            {"sub": user_id, "device_id": device_id, "exp": expires_at, "jti": new_jti}
+        )
+
+        return RefreshTokenResponse(token=encoded_jwt, expires_at=expires_at), user
+
+    # NOTE: Concurrent refreshes from tabs sharing the same cookie get the pair issued by the first one:
+
+    async def get_rotated_tokens(self, jti: str) -> AuthResponse | None:
+        """Get the token pair issued when the refresh token was rotated, while still inside the grace window."""
+        if s.REFRESH_TOKEN_REUSE_GRACE_SECONDS <= 0:
+            return None
+
+        try:
+            cached = await self._cache.get(f"rotated_refresh_token:{jti}")
+        except aioredis.RedisError:
+            return None
+
+        return AuthResponse.model_validate_json(cached) if cached else None
+
+    async def wait_for_rotated_tokens(self, jti: str) -> AuthResponse | None:
+        """Wait briefly for a concurrent rotation of the same refresh token to publish its token pair."""
+        if s.REFRESH_TOKEN_REUSE_GRACE_SECONDS <= 0:
+            return None
+
+        for _ in range(ROTATION_WAIT_ATTEMPTS):
+            rotated_tokens = await self.get_rotated_tokens(jti)
+
+            if rotated_tokens:
+                return rotated_tokens
+
+            await asyncio.sleep(ROTATION_WAIT_INTERVAL)
+
+        return None
+
+    def store_rotated_tokens(self, jti: str, tokens: AuthResponse) -> None:
+        """Remember the token pair issued for a rotated refresh token for the grace window, once the rotation is committed."""
+        if s.REFRESH_TOKEN_REUSE_GRACE_SECONDS <= 0:
+            return
+
+        # NOTE: Published before the commit, a concurrent tab could be handed a pair whose rotation is then rolled back.
+        async def _store():
+            try:
+                await self._cache.set(
+                    f"rotated_refresh_token:{jti}",
+                    tokens.model_dump_json(),
+                    ex=s.REFRESH_TOKEN_REUSE_GRACE_SECONDS,
+                )
+            except aioredis.RedisError:
+                pass
+
+        self._auth_dao.session.after_commit(_store)
 
     async def invalidate_refresh_token(self, jti: str) -> None:
         """Invalidate a refresh token. Takes the token string as an argument."""
-        await self._auth_dao.delete_refresh_token(jti)
+        await self._refresh_token_store.delete(jti)
+
+    async def invalidate_user_refresh_tokens(self, user_id: str) -> None:
+        """Invalidate every refresh token issued to a user. Takes the user's id as an argument."""
+        await self._refresh_token_store.delete_user_tokens(user_id)
 
     async def _store_refresh_token(self, token_data: RefreshTokenData) -> None:
-        """Store the refresh token in the database. Takes the raw token data as arguments."""
-        await self._auth_dao.insert_refresh_token(token_data)
+        """Store the refresh token in the configured store. Takes the raw token data as arguments."""
+        await self._refresh_token_store.insert(token_data)
 
     # NOTE: Validation tokens methods:
 
     async def create_validation_token(
         self, user_id: str, token_type: ValidationTokenType
     ) -> str:
-        """Create a validation token. Takes the user's id and the token type as arguments."""
-
-        existing_token = await self._auth_dao.get_validation_token_by_user_id_and_type(
-            user_id, token_type
-        )
-
-        if existing_token:
-            await self.invalidate_validation_token(existing_token.token)
-
+        """Create a validation token, replacing the user's previous token of that type. Takes the user's id and the token type as arguments."""
         new_token = self._generate_validation_token(user_id, token_type)
-        await self._auth_dao.insert_validation_token(new_token)
+        await self._validation_token_store.issue(new_token)
         return new_token.token
 
-    async def verify_validation_token(
-        self, token_str: str
-    ) -> Tuple[User, ValidationToken]:
-        """Validate a validation token. Takes the token string value as an argument."""
-        token = await self._auth_dao.get_validation_token(token_str)
+    async def consume_validation_token(self, token_str: str) -> ValidationTokenData:
+        """Use up a validation token, it cannot be consumed twice. Takes the token string value as an argument."""
+        token = await self._validation_token_store.consume(token_str)
 
         if not token:
             raise InvalidVerificationTokenException()
 
-        user = await self._user_dao.get_user_by_id(token.user_id)
-
-        if not user:
-            raise InvalidVerificationTokenException()
-
-        return (user, token)
-
-    async def invalidate_validation_token(self, token_str: str) -> None:
-        """Delete a validation token. Takes the token string value as an argument."""
-        await self._auth_dao.delete_validation_token(token_str)
+        return token
 
     def _generate_validation_token(
         self, user_id: str, token_type: ValidationTokenType
@@ -0,0 +1,274 @@
+from datetime import timedelta
+from time import monotonic
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import pytest
+from jose import JWTError
+from jose import jwt
+from server.config import settings as s
+from server.db.auth.dao import AuthDAO
+from server.db.auth.schema import ValidationToken
+from server.db.auth.schema import ValidationTokenType
+from server.db.auth.stores import RedisValidationTokenStore
+from server.db.auth.stores import RefreshTokenStore
+from server.db.auth.stores import SQLRefreshTokenStore
+from server.db.auth.stores import SQLValidationTokenStore
+from server.db.cache import LocalCache
+from server.db.user.dao import UserDAO
+from server.exceptions.auth import InvalidRefreshTokenException
+from server.exceptions.auth import InvalidVerificationTokenException
+from server.exceptions.auth import TokenNotFoundException
+from server.models import ValidationTokenData
+from server.utils import nowutc
+from server.utils.security.jwt_codecs import JoseCodec
+from server.utils.security.jwt_codecs import PyJWTCodec
+from server.utils.security.tokens import TokenManager
+
+
+@pytest.fixture
+def mock_auth_dao():
+    return AsyncMock(spec=AuthDAO)
+
+
+@pytest.fixture
+def token_manager(mock_auth_dao):
+    return TokenManager(
+        mock_auth_dao,
+        AsyncMock(spec=UserDAO),
+        AsyncMock(),
+        SQLRefreshTokenStore(mock_auth_dao),
+        SQLValidationTokenStore(mock_auth_dao),
+    )
+
+
+@pytest.mark.asyncio
+async def test_rotate_refresh_token_success(
+    token_manager, mock_auth_dao, sample_refresh_token, mock_current_user_with_id
+):
+    user = mock_current_user_with_id()
+    mock_auth_dao.rotate_refresh_token.return_value = (user, "456")
+
+    new_refresh_token, owner = await token_manager.rotate_refresh_token(
+        sample_refresh_token
+    )
+
+    payload = jwt.decode(
+        new_refresh_token.token, s.AUTH_SECRET, algorithms=[s.ALGORITHM]
+    )
+    old_jti, new_jti, _ = mock_auth_dao.rotate_refresh_token.call_args.args
+
+    assert owner == user
+    assert old_jti == "refresh_token"
+    assert payload["jti"] == new_jti
+    assert payload["sub"] == user.id
+    assert payload["device_id"] == "456"
+
+
+@pytest.mark.asyncio
+async def test_rotate_refresh_token_not_found(
+    token_manager, mock_auth_dao, sample_refresh_token
+):
+    mock_auth_dao.rotate_refresh_token.return_value = None
+
+    with pytest.raises(TokenNotFoundException):
+        await token_manager.rotate_refresh_token(sample_refresh_token)
+
+
+@pytest.mark.asyncio
+async def test_rotate_refresh_token_without_jti(
+    token_manager, mock_auth_dao, sample_refresh_token_no_jti
+):
+    with pytest.raises(InvalidRefreshTokenException):
+        await token_manager.rotate_refresh_token(sample_refresh_token_no_jti)
+
+    mock_auth_dao.rotate_refresh_token.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_rotate_refresh_token_with_invalid_signature(token_manager):
+    with pytest.raises(InvalidRefreshTokenException):
+        await token_manager.rotate_refresh_token("not.a.token")
+
+
+@pytest.mark.asyncio
+async def test_rotate_refresh_token_loads_owner_when_store_does_not(
+    mock_auth_dao, sample_refresh_token, mock_current_user_with_id
+):
+    user = mock_current_user_with_id()
+    mock_user_dao = AsyncMock(spec=UserDAO)
+    mock_user_dao.get_user_by_id.return_value = user
+    mock_store = AsyncMock(spec=RefreshTokenStore)
+    mock_store.rotate.return_value = (user.id, "456", None)
+    token_manager = TokenManager(
+        mock_auth_dao,
+        mock_user_dao,
+        AsyncMock(),
+        mock_store,
+        SQLValidationTokenStore(mock_auth_dao),
+    )
+
+    new_refresh_token, owner = await token_manager.rotate_refresh_token(
+        sample_refresh_token
+    )
+
+    payload = jwt.decode(
+        new_refresh_token.token, s.AUTH_SECRET, algorithms=[s.ALGORITHM]
+    )
+
+    assert owner == user
+    assert payload["sub"] == user.id
+    mock_user_dao.get_user_by_id.assert_awaited_once_with(user.id)
+    mock_auth_dao.rotate_refresh_token.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_create_validation_token_upserts_in_one_statement(
+    token_manager, mock_auth_dao
+):
+    token = await token_manager.create_validation_token(
+        "123", ValidationTokenType.PASSWORD_RESET
+    )
+
+    (issued,) = mock_auth_dao.upsert_validation_token.call_args.args
+
+    assert issued.token == token
+    assert issued.user_id == "123"
+    assert issued.token_type == ValidationTokenType.PASSWORD_RESET
+
+
+@pytest.mark.asyncio
+async def test_consume_validation_token_deletes_and_returns_it(
+    token_manager, mock_auth_dao
+):
+    mock_auth_dao.consume_validation_token.return_value = ValidationToken(
+        token="valid_token",
+        user_id="123",
+        token_type=ValidationTokenType.VERIFICATION,
+        expires_at=nowutc() + timedelta(minutes=10),
+    )
+
+    token = await token_manager.consume_validation_token("valid_token")
+
+    assert token.user_id == "123"
+    mock_auth_dao.consume_validation_token.assert_awaited_once_with("valid_token")
+
+
+@pytest.mark.asyncio
+async def test_consume_validation_token_already_used(token_manager, mock_auth_dao):
+    mock_auth_dao.consume_validation_token.return_value = None
+
+    with pytest.raises(InvalidVerificationTokenException):
+        await token_manager.consume_validation_token("used_token")
+
+
+@pytest.mark.asyncio
+async def test_redis_validation_token_is_deleted_after_the_commit():
+    token_data = ValidationTokenData(
+        token="valid_token",
+        user_id="123",
+        token_type=ValidationTokenType.PASSWORD_RESET,
+        expires_at=nowutc() + timedelta(minutes=10),
+    )
+    cache = AsyncMock()
+    cache.set.side_effect = [True, None]
+    cache.get.return_value = token_data.model_dump_json()
+    session = MagicMock()
+    store = RedisValidationTokenStore(cache, session)
+
+    token = await store.consume("valid_token")
+    assert token.user_id == "123"
+    cache.delete.assert_not_awaited()
+
+    assert await store.consume("valid_token") is None
+
+    (delete_token,) = session.after_commit.call_args.args
+    await delete_token()
+    cache.delete.assert_awaited_once_with(
+        "validation_token:valid_token", "validation_token_claim:valid_token"
+    )
+
+
+@pytest.mark.asyncio
+async def test_rotated_tokens_are_stored_after_the_commit(
+    token_manager, mock_auth_dao, sample_auth_response
+):
+    cache = token_manager._cache
+    mock_auth_dao.session = MagicMock()
+
+    with patch.object(s, "REFRESH_TOKEN_REUSE_GRACE_SECONDS", 10):
+        token_manager.store_rotated_tokens("jti", sample_auth_response)
+        cache.set.assert_not_called()
+
+        (store,) = mock_auth_dao.session.after_commit.call_args.args
+        await store()
+
+    cache.set.assert_awaited_once_with(
+        "rotated_refresh_token:jti", sample_auth_response.model_dump_json(), ex=10
+    )
+
+
+@pytest.mark.asyncio
+async def test_access_token_claims_of_stateless_tokens(mock_current_user_with_id):
+    user = mock_current_user_with_id()
+    cache = AsyncMock()
+    cache.get.return_value = "1700000000000"
+    token_manager = TokenManager(
+        AsyncMock(spec=AuthDAO),
+        AsyncMock(spec=UserDAO),
+        cache,
+        AsyncMock(spec=RefreshTokenStore),
+        AsyncMock(),
+    )
+
+    with patch.object(s, "STATELESS_ACCESS_TOKENS", True):
+        claims = await token_manager.access_token_claims(user)
+
+    access_token = token_manager.create_access_token(data=claims)
+    verified_token = token_manager.verify_access_token(access_token.token)
+
+    assert verified_token.id == user.id
+    assert verified_token.role == user.role
+    assert verified_token.verified is True
+    assert verified_token.version == 1700000000000
+
+
+def test_verify_access_token_is_cached_until_expiration(mock_auth_dao):
+    codec = MagicMock(wraps=JoseCodec(s.AUTH_SECRET, s.ALGORITHM))
+    verified_access_tokens = LocalCache(max_size=10, ttl=86400)
+    token_manager = TokenManager(
+        mock_auth_dao,
+        AsyncMock(spec=UserDAO),
+        AsyncMock(),
+        AsyncMock(spec=RefreshTokenStore),
+        AsyncMock(),
+        codec=codec,
+        verified_access_tokens=verified_access_tokens,
+    )
+    access_token = token_manager.create_access_token(data={"sub": "123"}).token
+
+    first = token_manager.verify_access_token(access_token)
+    second = token_manager.verify_access_token(access_token)
+
+    assert first is second
+    codec.decode.assert_called_once()
+
+    # The entry does not outlive the token, and the token itself is not kept
+    ((key, (expires_at, _)),) = verified_access_tokens._entries.items()
+    remaining = (first.expires_at - nowutc()).total_seconds()
+    assert expires_at - monotonic() == pytest.approx(remaining, abs=1)
+    assert access_token not in key
+
+
+def test_pyjwt_codec_reads_tokens_of_the_jose_codec():
+    pytest.importorskip("jwt")
+    jose_codec = JoseCodec(s.AUTH_SECRET, s.ALGORITHM)
+    pyjwt_codec = PyJWTCodec(s.AUTH_SECRET, s.ALGORITHM)
+
+    token = jose_codec.encode({"sub": "123", "exp": nowutc() + timedelta(minutes=5)})
+
+    assert pyjwt_codec.decode(token)["sub"] == "123"
+
+    with pytest.raises(JWTError):
+        pyjwt_codec.decode(token + "tampered")